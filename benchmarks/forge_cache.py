@@ -0,0 +1,87 @@
+"""Compares creating a forge factory from a config file without a forge cache, with an empty cache and with a warm
+cache.
+
+Usage: make benchmarks, or hatch run python benchmarks/forge_cache.py [--forges 5] [--items 20000] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from skymantle_mock_data_forge.forge_factory import ForgeFactory
+from skymantle_mock_data_forge.models import OverrideType
+
+_overrides = [
+    {"key_paths": "data.PK", "override_type": OverrideType.FORMAT_VALUE, "override": ["some_run"]},
+]
+
+
+def _create_config(forges: int, items: int) -> list[dict]:
+    return [
+        {
+            "forge_id": f"some_config_{forge}",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK", "SK"],
+                "items": [
+                    {
+                        "tags": {"type": "user", "index": str(index % 10)},
+                        "data": {
+                            "PK": f"{{}}#user#{forge}#{index}",
+                            "SK": "profile",
+                            "name": f"Some User {index}",
+                            "email": f"user{index}@example.com",
+                            "age": index % 100,
+                            "address": {"street": f"{index} Some Street", "city": "Some City"},
+                        },
+                    }
+                    for index in range(items)
+                ],
+            },
+        }
+        for forge in range(forges)
+    ]
+
+
+def _time_factory(config_path: str, cache_dir: str | None) -> float:
+    start = time.perf_counter()
+    ForgeFactory(config_path, overrides=_overrides, cache_dir=cache_dir)
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compares creating a forge factory with and without a forge cache.")
+    parser.add_argument("--forges", type=int, default=5, help="The number of forges in the config file.")
+    parser.add_argument("--items", type=int, default=20_000, help="The number of items per forge.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of runs, the fastest is reported.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "forge_config.json")
+        cache_dir = os.path.join(directory, "cache")
+
+        with open(config_path, "w") as file:
+            json.dump(_create_config(args.forges, args.items), file)
+
+        no_cache = min(_time_factory(config_path, None) for _ in range(args.repeat))
+
+        cold_timings = []
+        for _ in range(args.repeat):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold_timings.append(_time_factory(config_path, cache_dir))
+
+        warm = min(_time_factory(config_path, cache_dir) for _ in range(args.repeat))
+
+        size = os.path.getsize(config_path) / 1024 / 1024
+        sys.stdout.write(f"{args.forges} forges x {args.items} items, {size:.1f} MiB config file\n")
+        sys.stdout.write(f"{'no cache':<12}{no_cache:>8.2f}s\n")
+        sys.stdout.write(f"{'cold cache':<12}{min(cold_timings):>8.2f}s\n")
+        sys.stdout.write(f"{'warm cache':<12}{warm:>8.2f}s\n")
+
+
+if __name__ == "__main__":
+    main()
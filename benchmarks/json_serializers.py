@@ -0,0 +1,117 @@
+"""Compares the JSON serializers on forge configs and S3 json payloads of a few representative sizes. Configs are
+parsed the way the forge factory parses them, so large JSON files are streamed in chunks.
+
+Usage: make benchmarks, or hatch run python benchmarks/json_serializers.py [--repeat 5]
+"""
+
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+from skymantle_mock_data_forge.config_loader import iter_config, write_config
+from skymantle_mock_data_forge.forge_factory import ForgeFactory
+from skymantle_mock_data_forge.serializers import JsonSerializer, get_json_serializer, orjson
+
+# Number of items per forge config, from a handful of test records to a large seed data set.
+_fixture_sizes = (10, 1_000, 10_000)
+
+
+def _create_items(count: int) -> list[dict]:
+    return [
+        {
+            "PK": f"user#{index}",
+            "SK": "profile",
+            "name": f"Some User {index}",
+            "email": f"user{index}@example.com",
+            "age": index % 100,
+            "balance": index * 1.25,
+            "active": index % 2 == 0,
+            "tags": ["some_tag", "other_tag"],
+            "address": {"street": f"{index} Some Street", "city": "Some City", "postal_code": "A1A 1A1"},
+        }
+        for index in range(count)
+    ]
+
+
+def _create_configs(count: int) -> list[dict]:
+    return [
+        {
+            "forge_id": "some_dynamodb_config",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK", "SK"],
+                "items": [{"data": item} for item in _create_items(count)],
+            },
+        },
+        {
+            "forge_id": "some_s3_config",
+            "s3": {
+                "bucket": {"name": "some_bucket"},
+                "s3_objects": [{"key": "some_json", "data": {"json": {"items": _create_items(count)}}}],
+            },
+        },
+    ]
+
+
+def _parse_config(path: str, serializer: JsonSerializer) -> list:
+    return list(iter_config(path, serializer=serializer))
+
+
+def _create_factory(path: str, serializer: JsonSerializer) -> ForgeFactory:
+    return ForgeFactory(path, serializer=serializer)
+
+
+def _encode_payload(payload: dict, serializer: JsonSerializer) -> bytes:
+    return serializer.dumps(payload)
+
+
+def _time(function: Callable[[], object], repeat: int) -> float:
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compares the JSON serializers.")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of runs, the fastest is reported.")
+    args = parser.parse_args(argv)
+
+    names = ["json", "auto"] if orjson is None else ["json", "orjson", "auto"]
+    if orjson is None:
+        sys.stdout.write("orjson isn't installed, the auto serializer uses the standard library\n")
+
+    sys.stdout.write(f"{'benchmark':<28}{'items':>8}" + "".join(f"{name:>12}" for name in names) + "\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in _fixture_sizes:
+            configs = _create_configs(size)
+            payload = configs[1]["s3"]["s3_objects"][0]["data"]["json"]
+            benchmarks: dict[str, Callable[[JsonSerializer], object]] = {}
+
+            for extension in ("json", "jsonl"):
+                path = os.path.join(directory, f"forge_config_{size}.{extension}")
+                write_config(path, configs)
+
+                benchmarks[f"parse config (.{extension})"] = functools.partial(_parse_config, path)
+                benchmarks[f"forge factory (.{extension})"] = functools.partial(_create_factory, path)
+
+            benchmarks["encode s3 json payload"] = functools.partial(_encode_payload, payload)
+
+            for benchmark, function in benchmarks.items():
+                timings = [_time(functools.partial(function, get_json_serializer(name)), args.repeat) for name in names]
+                sys.stdout.write(
+                    f"{benchmark:<28}{size:>8}" + "".join(f"{timing * 1000:>10.2f}ms" for timing in timings) + "\n"
+                )
+
+
+if __name__ == "__main__":
+    main()
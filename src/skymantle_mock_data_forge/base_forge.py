@@ -1,16 +1,24 @@
+import asyncio
 import copy
-import os
-from collections.abc import Callable
-from typing import Final
+import json
+import time
+from collections.abc import Callable, Hashable
+from typing import Any, Final
 
 from boto3 import Session
-from skymantle_boto_buddy import cloudformation, ssm
 
+from skymantle_mock_data_forge import views
+from skymantle_mock_data_forge.destination_resolver import DestinationResolver
+from skymantle_mock_data_forge.key_path_policy import KeyPathErrorPolicy
+from skymantle_mock_data_forge.load_manifest import LoadManifest
 from skymantle_mock_data_forge.models import (
     DataForgeConfigOverride,
     ForgeQuery,
+    OverrideContext,
     OverrideType,
 )
+from skymantle_mock_data_forge.query_plan import QueryPlan
+from skymantle_mock_data_forge.tag_index import TagIndex
 
 
 class BaseForge:
@@ -18,26 +26,116 @@ class BaseForge:
         "StringEquals": lambda value, condition_value: value == condition_value,
         "StringLike": lambda value, condition_value: condition_value in value,
     }
+    _max_query_results: Final[int] = 1024
 
     def __init__(
-        self, forge_id: str, overrides: list[DataForgeConfigOverride] | None = None, session: Session = None
+        self,
+        forge_id: str,
+        overrides: list[DataForgeConfigOverride] | None = None,
+        session: Session = None,
+        *,
+        destination_ttl: float | None = None,
+        destination_resolver: DestinationResolver | None = None,
+        key_path_error_policy: KeyPathErrorPolicy | None = None,
+        manifest: LoadManifest | None = None,
     ) -> None:
         self._forge_id: str = forge_id
         self._aws_session = session
         self._overrides = overrides
+        self._key_path_error_policy = key_path_error_policy or KeyPathErrorPolicy.from_environment()
+        self._manifest = manifest
+
+        # Resolved destination identifiers, keyed by resource config, with the time they were resolved at.
+        self._destination_ttl = destination_ttl
+        self._destination_identifiers: dict[str, tuple[str, float]] = {}
+
+        # SSM parameters and CloudFormation stack outputs, shared with the other forges of a forge factory.
+        self._destination_resolver = destination_resolver or DestinationResolver()
+
+        # Subclasses add their items with _index_items once overrides have been applied.
+        self._tag_index = TagIndex()
+        self._query_results: dict[Hashable, tuple[int, ...]] = {}
+        self._query_results_size = 0
+
+    def __getstate__(self) -> dict:
+        # The session, error policy, manifest, resolved destinations and query results are not pickled with the forge
+        state = self.__dict__.copy()
+        for name in (
+            "_aws_session",
+            "_key_path_error_policy",
+            "_manifest",
+            "_destination_identifiers",
+            "_destination_resolver",
+            "_query_results",
+        ):
+            state.pop(name)
+
+        state["_query_results_size"] = 0
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._aws_session = None
+        self._key_path_error_policy = KeyPathErrorPolicy.from_environment()
+        self._manifest = None
+        self._destination_identifiers = {}
+        self._destination_resolver = DestinationResolver()
+        self._query_results = {}
+
+    def _attach(
+        self,
+        session: Session = None,
+        key_path_error_policy: KeyPathErrorPolicy | None = None,
+        manifest: LoadManifest | None = None,
+        destination_resolver: DestinationResolver | None = None,
+    ) -> None:
+        """Sets the state that isn't pickled, for a forge loaded from a cache."""
+        self._aws_session = session
+        self._key_path_error_policy = key_path_error_policy or self._key_path_error_policy
+        self._manifest = manifest
+        self._destination_resolver = destination_resolver or self._destination_resolver
+
+    def invalidate_destination_identifier(self) -> None:
+        """Clears the cached destination identifiers, including the SSM parameters and CloudFormation stack outputs
+        shared with the other forges of a forge factory, the next call will resolve them again."""
+        for cache_key in self._destination_identifiers:
+            self._destination_resolver.invalidate(json.loads(cache_key), self._aws_session)
+
+        self._destination_identifiers.clear()
 
     def _get_destination_identifier(self, resource_config):
+        cache_key = json.dumps(resource_config, sort_keys=True)
+        cached = self._destination_identifiers.get(cache_key)
+
+        if cached is not None:
+            value, resolved_at = cached
+
+            if self._destination_ttl is None or time.monotonic() - resolved_at < self._destination_ttl:
+                return value
+
+        value = self._resolve_destination_identifier(resource_config)
+        self._destination_identifiers[cache_key] = (value, time.monotonic())
+
+        return value
+
+    def _resolve_destination_identifier(self, resource_config):
+        # Values shared with other forges are looked up again once they're older than the TTL.
         if resource_config.get("name"):
             value = resource_config["name"]
 
         elif resource_config.get("ssm"):
-            value = ssm.get_parameter(resource_config["ssm"], session=self._aws_session)
+            value = self._destination_resolver.get_parameter(
+                resource_config["ssm"], self._aws_session, max_age=self._destination_ttl
+            )
 
         else:
             stack_name = resource_config["stack"]["name"]
             output = resource_config["stack"]["output"]
 
-            outputs = cloudformation.get_stack_outputs(stack_name, session=self._aws_session)
+            outputs = self._destination_resolver.get_stack_outputs(
+                stack_name, self._aws_session, max_age=self._destination_ttl
+            )
             output_value = outputs.get(output)
 
             if output_value:
@@ -47,61 +145,172 @@ class BaseForge:
 
         return value
 
-    def _get_data_query(self, query: ForgeQuery, data: dict) -> dict:
-        if len(query.keys()) == 0:
-            raise Exception("Missing operator from query")
+    async def aget_data(
+        self, *, query: ForgeQuery | QueryPlan, return_source: bool, read_only: bool = False
+    ) -> list[dict]:
+        """Async version of get_data, the items are copied in a thread so the event loop isn't blocked."""
+        return await asyncio.to_thread(self.get_data, query=query, return_source=return_source, read_only=read_only)
 
-        if not set(query.keys()).issubset(self._operators):
-            raise Exception(f"Only the following query operators are supported: {list(self._operators.keys())}")
+    async def _run_in_threads(self, calls: list[Callable[[], Any]], max_concurrency: int) -> list[BaseException]:
+        """Runs blocking calls in threads, at most max_concurrency at a time, and returns the errors."""
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-        for condition in query.values():
-            if not isinstance(condition, dict):
-                raise Exception("The condition for an operator must be a dict.")
+        async def run(call: Callable[[], Any]) -> None:
+            async with semaphore:
+                await asyncio.to_thread(call)
 
-        for operator, conditions in query.items():
-            for condition_key, condition_value in conditions.items():
-                data = self._find_matches(data, operator, condition_key, condition_value)
+        results = await asyncio.gather(*(run(call) for call in calls), return_exceptions=True)
 
-        return data
+        return [result for result in results if isinstance(result, BaseException)]
 
-    def _find_matches(self, data: dict, operator: str, condition_key: str, condition_value: str) -> dict:
-        data = [item for item in data if condition_key in item.get("tags", {})]
+    def _diff_manifest(self, destination: str, hashes: dict[str, str]) -> tuple[set[str], list[str]]:
+        """Compares item hashes, by item key, with the manifest. Returns the keys of new or changed items, and the keys
+        of items that were loaded before but have since been removed."""
+        previous_hashes = self._manifest.get_hashes(self._forge_id, destination)
 
-        matches = []
+        changed = {item_key for item_key, item_hash in hashes.items() if previous_hashes.get(item_key) != item_hash}
+        removed = [item_key for item_key in previous_hashes if item_key not in hashes]
 
-        for item in data:
-            value = item["tags"][condition_key]
+        return changed, removed
+
+    def _index_items(self, items: list[dict]) -> None:
+        for item in items:
+            self._tag_index.add(item)
+
+    @classmethod
+    def compile_query(cls, query: ForgeQuery) -> QueryPlan:
+        """Validates and compiles a query, so it can be reused without being validated again.
+
+        Args:
+            query (ForgeQuery): The query to compile.
 
-            if isinstance(value, str):
-                if self._operators[operator](value, condition_value):
-                    matches.append(item)
+        Raises:
+            Exception: The query is not valid.
 
-            elif isinstance(value, list):
-                for list_item in value:
-                    if not isinstance(list_item, str):
-                        raise Exception("Tag values can only be strings or list of strings.")
+        Returns:
+            QueryPlan: The compiled query.
+        """
+        return QueryPlan.compile(query, cls._operators.keys())
 
-                    if self._operators[operator](list_item, condition_value):
-                        matches.append(item)
-                        break
+    def _get_data_query(self, query: ForgeQuery | QueryPlan, data: list[dict]) -> list[dict]:
+        """Gets the items matching the query, data must be the items added to the tag index and in the same order."""
+        plan = query if isinstance(query, QueryPlan) else self.compile_query(query)
+
+        # Results are only valid for the items that were indexed when the query was run.
+        if self._query_results_size != self._tag_index.size or len(self._query_results) >= self._max_query_results:
+            self._query_results.clear()
+            self._query_results_size = self._tag_index.size
+
+        # Checked before the cached results, since plans with the same key can list their conditions in another order.
+        if any(self._tag_index.get_invalid_positions(condition_key) for _, condition_key, _ in plan.conditions):
+            self._validate_tag_values(plan)
+
+        positions = self._query_results.get(plan.key) if plan.key is not None else None
+
+        if positions is None:
+            positions = self._run_query_plan(plan)
+
+            if plan.key is not None:
+                self._query_results[plan.key] = positions
+
+        return [data[position] for position in positions]
+
+    def _run_query_plan(self, plan: QueryPlan) -> tuple[int, ...]:
+        equals_matches = []
+        other_conditions = []
+
+        for operator, condition_key, condition_value in plan.conditions:
+            if operator == "StringEquals" and isinstance(condition_value, str):
+                equals_matches.append(self._tag_index.get_positions(condition_key, condition_value))
             else:
+                other_conditions.append((operator, condition_key, condition_value))
+
+        if not equals_matches and not other_conditions:
+            return tuple(range(self._tag_index.size))
+
+        # Start from the most selective StringEquals condition, since those are already resolved by the index,
+        # and stop as soon as nothing matches.
+        positions: set[int] | None = None
+
+        for matches in sorted(equals_matches, key=len):
+            positions = matches if positions is None else positions & matches
+
+            if not positions:
+                return ()
+
+        for operator, condition_key, condition_value in other_conditions:
+            matches = self._find_matches(operator, condition_key, condition_value)
+            positions = matches if positions is None else positions & matches
+
+            if not positions:
+                return ()
+
+        return tuple(sorted(positions))
+
+    def _validate_tag_values(self, plan: QueryPlan) -> None:
+        """Raises when an item with an invalid tag value reaches a condition on that tag. The conditions are applied
+        in query order, so items excluded by an earlier condition aren't reported."""
+        positions = set(range(self._tag_index.size))
+
+        for operator, condition_key, condition_value in plan.conditions:
+            if positions & self._tag_index.get_invalid_positions(condition_key):
                 raise Exception("Tag values can only be strings or list of strings.")
 
+            positions &= self._find_matches(operator, condition_key, condition_value)
+
+            if not positions:
+                return
+
+    def _find_matches(self, operator: str, condition_key: str, condition_value: str) -> set[int]:
+        if operator == "StringEquals" and isinstance(condition_value, str):
+            return self._tag_index.get_positions(condition_key, condition_value)
+
+        if operator == "StringLike" and isinstance(condition_value, str):
+            return self._tag_index.get_positions_like(condition_key, condition_value)
+
+        matches = set()
+
+        for value, positions in self._tag_index.get_values(condition_key).items():
+            if self._operators[operator](value, condition_value):
+                matches.update(positions)
+
         return matches
 
-    def _override_data(self, items: list[dict]) -> list[dict]:
+    def _override_data(self, items: list[dict], overrides: list[DataForgeConfigOverride] | None = None) -> list[dict]:
         data: list[dict] = [copy.deepcopy(item) for item in items]
 
-        if not self._overrides:
+        if overrides is None:
+            overrides = self._overrides
+
+        if not overrides:
             return data
 
-        if not (isinstance(self._overrides, list) and all(isinstance(item, dict) for item in self._overrides)):
+        if not (isinstance(overrides, list) and all(isinstance(item, dict) for item in overrides)):
             raise Exception("Overrides must be a list[DataForgeConfigOverride]")
 
         if not (isinstance(data, list) and all(isinstance(item, dict) for item in data)):
             raise Exception("The provided data must be a list of dictionaries")
 
-        for config_override in self._overrides:
+        # Key paths are split once, and then every override is applied to an item before moving to the next one.
+        compiled_overrides = self._compile_overrides(overrides)
+
+        for item in data:
+            for keys, override_type, override, context_type in compiled_overrides:
+                self._apply_override(item, keys, override_type, override, context_type=context_type)
+
+        return data
+
+    @property
+    def key_path_error_policy(self) -> KeyPathErrorPolicy:
+        """The policy for key path errors, which includes a summary of suppressed errors."""
+        return self._key_path_error_policy
+
+    def _compile_overrides(
+        self, overrides: list[DataForgeConfigOverride]
+    ) -> list[tuple[tuple[str, ...], OverrideType, Any, OverrideContext]]:
+        compiled_overrides = []
+
+        for config_override in overrides:
             key_paths = config_override.get("key_paths")
 
             if isinstance(key_paths, str):
@@ -112,77 +321,93 @@ class BaseForge:
 
             override_type = config_override.get("override_type")
             override = config_override.get("override")
+            context_type = config_override.get("context", OverrideContext.COPY)
 
             for key_path in key_paths:
-                for item in data:
-                    self._update_item(item, key_path, override_type, override)
-
-        return data
-
-    def _update_item(self, item: dict, key_path: str, override_type: OverrideType, override: any):
-        try:
-            result = self._travel_key_path(item, key_path, override_type, override)
-
-            if result is None:
-                return
-
-            key = result[0]
-            item_to_update = result[1]
-
-            if key not in item_to_update:
-                raise Exception(f"The key:{key} does not exist.")
+                compiled_overrides.append((tuple(key_path.split(".")), override_type, override, context_type))
+
+        return compiled_overrides
+
+    def _apply_override(
+        self,
+        item: dict,
+        keys: tuple[str, ...],
+        override_type: OverrideType,
+        override: Any,
+        *,
+        context_type: OverrideContext,
+    ) -> None:
+        # Each entry is the dict to continue from, the position in keys to continue at and the item passed as context
+        # to CALL_FUNCTION. Lists of dicts along the key path fan out into an entry per dict, which is then the context.
+        stack: list[tuple[dict, int, dict]] = [(item, 0, item)]
 
-        except Exception as e:
-            suppress_key_path_errors = os.environ.get("DATA_FORGE_SUPPRESS_KEY_PATH_ERRORS", "true")
+        while stack:
+            temp_item, start, context = stack.pop()
 
-            if suppress_key_path_errors in ["0", "false", "no", "off"]:
-                raise e
+            key_to_update = self._travel_keys(temp_item, keys, start, stack)
 
-            return
+            if key_to_update is None:
+                continue
 
-        match override_type:
-            case OverrideType.REPLACE_VALUE:
-                item_to_update[key] = override
+            if isinstance(key_to_update, str):
+                self._key_path_error_policy.handle(self._forge_id, ".".join(keys), key_to_update)
+                continue
 
-            case OverrideType.FORMAT_VALUE:
-                value = item_to_update[key]
+            key, item_to_update = key_to_update
 
-                if not isinstance(value, str):
-                    raise Exception(f"The value for key:{key} must be str for FORMAT_VALUE.")
+            match override_type:
+                case OverrideType.REPLACE_VALUE:
+                    item_to_update[key] = override
 
-                item_to_update[key] = value.format(*override)
+                case OverrideType.FORMAT_VALUE:
+                    value = item_to_update[key]
 
-            case OverrideType.CALL_FUNCTION:
-                item_to_update[key] = override(key, item_to_update[key], copy.deepcopy(item))
+                    if not isinstance(value, str):
+                        raise Exception(f"The value for key:{key} must be str for FORMAT_VALUE.")
 
-            case _:
-                raise Exception(f"Unsupported override type - {override_type}")
+                    item_to_update[key] = value.format(*override)
 
-    def _travel_key_path(self, item: dict, key_path: str, override_type: OverrideType, override: any) -> dict:
-        keys = key_path.split(".")
+                case OverrideType.CALL_FUNCTION:
+                    # A read-only view avoids copying the whole item for every call.
+                    if context_type == OverrideContext.READ_ONLY:
+                        context_value = views.read_only(context)
+                    else:
+                        context_value = copy.deepcopy(context)
 
-        prefix = ""
-        temp_item = item
+                    item_to_update[key] = override(key, item_to_update[key], context_value)
 
-        for key in keys[:-1]:
-            prefix += f"{key}."
+                case _:
+                    raise Exception(f"Unsupported override type - {override_type}")
 
+    def _travel_keys(
+        self, temp_item: dict, keys: tuple[str, ...], start: int, stack: list[tuple[dict, int, dict]]
+    ) -> tuple[str, dict] | str | None:
+        """Follows the keys from start, returning the key and dict to update, an error message when the key path
+        doesn't exist, or None when the key path continues in a list of dicts that have been added to the stack."""
+        for position in range(start, len(keys) - 1):
+            key = keys[position]
             temp_item = temp_item.get(key)
 
             if isinstance(temp_item, list):
-                sub_key_path = key_path.removeprefix(prefix)
+                # If the item is a list of dictionary, finish traversing the key path in each of the items, in order.
+                sub_items = []
 
-                # If the item is a list of dictionary. Iterate through the list and finished
-                # traversing the key path in each of the items.
                 for sub_item in temp_item:
                     if not isinstance(sub_item, dict):
-                        raise Exception(f"The key:{key} must be a list of dicts")
+                        stack.extend(reversed(sub_items))
+                        return f"The key:{key} must be a list of dicts"
 
-                    self._update_item(sub_item, sub_key_path, override_type, override)
+                    sub_items.append((sub_item, position + 1, sub_item))
 
+                stack.extend(reversed(sub_items))
                 return None
 
             if not isinstance(temp_item, dict):
-                raise Exception(f"The key:{key} does not exist or its value is not a dict")
+                return f"The key:{key} does not exist or its value is not a dict"
+
+        key = keys[-1]
+
+        if key not in temp_item:
+            return f"The key:{key} does not exist."
 
-        return keys[-1], temp_item
+        return key, temp_item
@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from typing import Final
+
+from skymantle_mock_data_forge.models import DataForgeConfig
+from skymantle_mock_data_forge.serializers import JsonSerializer, default_serializer
+
+try:
+    import msgpack
+except ImportError:  # no cov
+    msgpack = None
+
+_chunk_size: Final[int] = 64 * 1024
+_whitespace: Final[str] = " \t\n\r"
+# Nested objects and arrays up to this depth are skipped by a regular expression while finding the end of a value.
+_json_nesting: Final[int] = 16
+_json_lines_extensions: Final = (".jsonl", ".ndjson")
+_msgpack_extensions: Final = (".msgpack", ".mpk")
+
+
+def iter_config(
+    path: str, chunk_size: int = _chunk_size, *, serializer: JsonSerializer | None = None
+) -> Iterator[DataForgeConfig]:
+    """Parses the forge configs in a file one at a time. The format is based on the file extension:
+    - `.jsonl` or `.ndjson` - JSON Lines, one DataForgeConfig per line.
+    - `.msgpack` or `.mpk` - A sequence of MessagePack maps, one per DataForgeConfig. Requires `msgpack`.
+    - Anything else - JSON, a list of DataForgeConfig. Files no larger than the chunk size are parsed at once,
+      larger files are read in chunks, only the current forge config and the unparsed text are kept in memory.
+      Each forge config is parsed once its closing bracket is found.
+
+    Args:
+        path (str): The path to the config file.
+        chunk_size (int, optional): The minimum number of characters read at a time from JSON files.
+            Defaults to 64 KiB.
+        serializer (JsonSerializer | None, optional): Parses each forge config in JSON and JSON Lines files.
+            Defaults to orjson when it's installed, otherwise the standard library.
+
+    Raises:
+        Exception: The file doesn't contain a list of DataForgeConfig, or can't be parsed.
+
+    Yields:
+        DataForgeConfig: The forge configs, in file order.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    serializer = serializer or default_serializer
+
+    if extension in _json_lines_extensions:
+        return _iter_json_lines(path, serializer)
+
+    if extension in _msgpack_extensions:
+        return _iter_msgpack(path)
+
+    if os.path.getsize(path) <= chunk_size:
+        return _iter_small_json(path, serializer)
+
+    return _iter_json(path, chunk_size, serializer)
+
+
+def write_config(path: str, data_forge_configs: Iterable[DataForgeConfig]) -> None:
+    """Writes forge configs to a file, the format is based on the file extension, see iter_config.
+
+    Args:
+        path (str): The path to the config file.
+        data_forge_configs (Iterable[DataForgeConfig]): The forge configs to write.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in _json_lines_extensions:
+        with open(path, "w") as file:
+            for data_forge_config in data_forge_configs:
+                file.write(json.dumps(data_forge_config))
+                file.write("\n")
+
+    elif extension in _msgpack_extensions:
+        packer = _get_msgpack().Packer()
+
+        with open(path, "wb") as file:
+            for data_forge_config in data_forge_configs:
+                file.write(packer.pack(data_forge_config))
+
+    else:
+        with open(path, "w") as file:
+            json.dump(list(data_forge_configs), file)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Converts a config file to another format, for example JSON to JSON Lines or MessagePack."""
+    parser = argparse.ArgumentParser(description="Converts a mock data forge config file to another format.")
+    parser.add_argument("source", help="The config file to convert.")
+    parser.add_argument("destination", help="The converted config file, the format is based on the extension.")
+    args = parser.parse_args(argv)
+
+    write_config(args.destination, iter_config(args.source))
+
+
+def _iter_json_lines(path: str, serializer: JsonSerializer) -> Iterator[DataForgeConfig]:
+    with open(path, "rb") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                data_forge_config = serializer.loads(line)
+            except ValueError as e:
+                raise Exception(f"Invalid JSON in config file: {path} on line: {line_number}") from e
+
+            if not isinstance(data_forge_config, dict):
+                raise Exception("Each line of the config file must be a DataForgeConfig")
+
+            yield data_forge_config
+
+
+def _iter_msgpack(path: str) -> Iterator[DataForgeConfig]:
+    msgpack_module = _get_msgpack()
+
+    with open(path, "rb") as file:
+        # The default buffer limit is 100 MiB, a max_buffer_size of 0 allows forge configs up to 2 GiB.
+        unpacker = msgpack_module.Unpacker(file, raw=False, max_buffer_size=0)
+
+        try:
+            for data_forge_config in unpacker:
+                if not isinstance(data_forge_config, dict):
+                    raise Exception("Each value of the config file must be a DataForgeConfig")
+
+                yield data_forge_config
+        except (ValueError, msgpack_module.UnpackException) as e:
+            raise Exception(f"Invalid MessagePack in config file: {path}") from e
+
+        # Iteration stops without an error when the last value is cut off
+        if unpacker.tell() != os.fstat(file.fileno()).st_size:
+            raise Exception(f"Invalid MessagePack in config file: {path}")
+
+
+def _get_msgpack():
+    if msgpack is None:
+        raise Exception("msgpack is required for MessagePack config files, install skymantle_mock_data_forge[msgpack]")
+
+    return msgpack
+
+
+def _iter_small_json(path: str, serializer: JsonSerializer) -> Iterator[DataForgeConfig]:
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if not data.strip():
+        raise Exception("The config file must contain a list of DataForgeConfig")
+
+    try:
+        data_forge_configs = serializer.loads(data)
+    except ValueError as e:
+        raise Exception(f"Invalid JSON in config file: {path}") from e
+
+    if not isinstance(data_forge_configs, list) or not all(isinstance(config, dict) for config in data_forge_configs):
+        raise Exception("The config file must contain a list of DataForgeConfig")
+
+    yield from data_forge_configs
+
+
+def _compile_next_bracket(nesting: int) -> re.Pattern:
+    """Compiles a pattern matching the text up to and including the next bracket, skipping strings and complete
+    objects or arrays nested up to a depth. The first group is set for an opening bracket. It doesn't match when the
+    text ends first."""
+    text = r'[^"\[\]{}]++|"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+    nested = "(?!)"
+
+    for _ in range(nesting):
+        nested = rf"[\[{{](?:{text}|{nested})*+[\]}}]"
+
+    return re.compile(rf"(?:{text}|{nested})*+(?:([\[{{])|[\]}}])")
+
+
+_json_next_bracket: Final = _compile_next_bracket(_json_nesting)
+
+
+def _iter_json(path: str, chunk_size: int, serializer: JsonSerializer) -> Iterator[DataForgeConfig]:
+    with open(path) as file:
+        reader = _ChunkReader(file, chunk_size, serializer)
+
+        if reader.next_char() != "[":
+            raise Exception("The config file must contain a list of DataForgeConfig")
+
+        reader.position += 1
+
+        if reader.next_char() == "]":
+            return
+
+        while True:
+            data_forge_config = reader.decode(path)
+
+            if not isinstance(data_forge_config, dict):
+                raise Exception("The config file must contain a list of DataForgeConfig")
+
+            yield data_forge_config
+
+            char = reader.next_char()
+
+            if char == "]":
+                return
+
+            if char != ",":
+                raise Exception(f"Invalid JSON in config file: {path}")
+
+            reader.position += 1
+
+
+class _ChunkReader:
+    """The unparsed text of a file, which is read as needed and trimmed once values are decoded."""
+
+    def __init__(self, file, chunk_size: int, serializer: JsonSerializer) -> None:
+        self._file = file
+        self._chunk_size = chunk_size
+        self._serializer = serializer
+        self._decoder = json.JSONDecoder()
+        self._eof = False
+        self.buffer = ""
+        self.position = 0
+
+    def next_char(self) -> str:
+        """Skips whitespace and returns the next character, or an empty string at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _whitespace:
+                self.position += 1
+
+            if self.position < len(self.buffer) or not self._read():
+                return self.buffer[self.position : self.position + 1]
+
+    def decode(self, path: str) -> object:
+        """Decodes the value at the current position, reading more of the file until the value is complete."""
+        char = self.next_char()
+
+        # Objects and arrays are only decoded once the end is found, so a large value is parsed once rather than
+        # each time more of the file is read.
+        if char not in ("{", "["):
+            return self._raw_decode(path)
+
+        end = self._find_end(path)
+        text = self.buffer[self.position : end]
+
+        self.buffer = self.buffer[end:]
+        self.position = 0
+
+        try:
+            return self._serializer.loads(text)
+        except ValueError as e:
+            raise Exception(f"Invalid JSON in config file: {path}") from e
+
+    def _find_end(self, path: str) -> int:
+        """Finds the end of the object or array at the current position by matching brackets outside of strings."""
+        depth = 1
+        scanned = self.position + 1
+
+        while True:
+            match = _json_next_bracket.match(self.buffer, scanned)
+
+            if match is None:
+                # The rest of the buffer has no complete bracket, it's scanned again once more is read
+                offset = scanned - self.position
+
+                if not self._read():
+                    raise Exception(f"Invalid JSON in config file: {path}")
+
+                scanned = self.position + offset
+                continue
+
+            scanned = match.end()
+            depth += 1 if match.group(1) else -1
+
+            if depth == 0:
+                return scanned
+
+    def _raw_decode(self, path: str) -> object:
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as e:
+                if self._read():
+                    continue
+
+                raise Exception(f"Invalid JSON in config file: {path}") from e
+
+            # A number at the end of the buffer might continue in the next chunk
+            if end == len(self.buffer) and self._read():
+                continue
+
+            self.buffer = self.buffer[end:]
+            self.position = 0
+
+            return value
+
+    def _read(self) -> bool:
+        if self._eof:
+            return False
+
+        # Read at least as much as is buffered, so a large value is copied a logarithmic number of times.
+        chunk = self._file.read(max(self._chunk_size, len(self.buffer) - self.position))
+
+        if not chunk:
+            self._eof = True
+            return False
+
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+
+        return True
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+import boto3
+from boto3 import Session
+from skymantle_boto_buddy import cloudformation, ssm
+
+from skymantle_mock_data_forge.models import ResourceConfig
+
+logger = logging.getLogger(__name__)
+
+
+class DestinationResolver:
+    """Caches SSM parameter values and CloudFormation stack outputs, keyed by session, region and name. A forge factory
+    shares one resolver between its forges, and a forge created on its own has its own resolver.
+
+    Concurrent lookups of the same key are merged into a single call. Lookups can pass a maximum age in seconds,
+    older values are looked up again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[tuple, tuple[Any, float]] = {}
+        self._pending: dict[tuple, Future] = {}
+
+    def get_parameter(self, name: str, session: Session = None, *, max_age: float | None = None) -> str:
+        return self._get(
+            self._get_parameter_key(name, session),
+            lambda: ssm.get_parameter(name, session=session),
+            max_age,
+        )
+
+    def get_stack_outputs(
+        self, stack_name: str, session: Session = None, *, max_age: float | None = None
+    ) -> dict[str, str]:
+        return self._get(
+            self._get_stack_outputs_key(stack_name, session),
+            lambda: cloudformation.get_stack_outputs(stack_name, session=session),
+            max_age,
+        )
+
+    def invalidate(self, resource_config: ResourceConfig, session: Session = None) -> None:
+        """Removes the cached SSM parameter or CloudFormation stack outputs for a table or bucket config, the next
+        lookup calls AWS again.
+
+        Args:
+            resource_config (ResourceConfig): The table or bucket config.
+            session (Session, optional): The AWS session used for the lookup. Defaults to None.
+        """
+        if resource_config.get("name"):
+            return
+
+        if resource_config.get("ssm"):
+            key = self._get_parameter_key(resource_config["ssm"], session)
+        else:
+            key = self._get_stack_outputs_key(resource_config["stack"]["name"], session)
+
+        with self._lock:
+            self._values.pop(key, None)
+
+    def prefetch(self, resource_configs: list[ResourceConfig], session: Session = None, max_workers: int = 8) -> None:
+        """Resolves all distinct SSM parameters and CloudFormation stacks in parallel. Errors are not raised,
+        the lookup is attempted again when the destination is used.
+
+        Args:
+            resource_configs (list[ResourceConfig]): The table or bucket configs to resolve.
+            session (Session, optional): The AWS session used for the lookups. Defaults to None.
+            max_workers (int, optional): The maximum number of concurrent lookups. Defaults to 8.
+        """
+        lookups: dict[tuple[str, str], Callable] = {}
+
+        for resource_config in resource_configs:
+            if resource_config.get("name"):
+                continue
+
+            if resource_config.get("ssm"):
+                name = resource_config["ssm"]
+                lookups[("ssm", name)] = lambda name=name: self.get_parameter(name, session)
+
+            elif resource_config.get("stack"):
+                stack_name = resource_config["stack"]["name"]
+                lookups[("cloudformation", stack_name)] = lambda name=stack_name: self.get_stack_outputs(name, session)
+
+        if not lookups:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(lookups))) as executor:
+            futures = {key: executor.submit(lookup) for key, lookup in lookups.items()}
+
+        for (service, name), future in futures.items():
+            if future.exception() is not None:
+                logger.warning("Unable to prefetch %s destination %s: %s", service, name, future.exception())
+
+    def clear(self) -> None:
+        """Removes all cached values."""
+        with self._lock:
+            self._values.clear()
+
+    def _get(self, key: tuple, loader: Callable[[], Any], max_age: float | None) -> Any:
+        with self._lock:
+            cached = self._values.get(key)
+
+            if cached is not None and (max_age is None or time.monotonic() - cached[1] < max_age):
+                return cached[0]
+
+            future = self._pending.get(key)
+            is_owner = future is None
+
+            if is_owner:
+                future = Future()
+                self._pending[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(key)
+
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._values[key] = (value, time.monotonic())
+            self._pending.pop(key)
+
+        future.set_result(value)
+
+        return value
+
+    def _get_parameter_key(self, name: str, session: Session) -> tuple:
+        return ("ssm", *self._get_session_key(session), name)
+
+    def _get_stack_outputs_key(self, stack_name: str, session: Session) -> tuple:
+        return ("cloudformation", *self._get_session_key(session), stack_name)
+
+    def _get_session_key(self, session: Session) -> tuple[Session, str]:
+        region_name = (session or boto3._get_default_session()).region_name
+        return session, region_name
@@ -1,47 +1,102 @@
+import asyncio
 import copy
+import functools
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from decimal import Decimal
+from typing import Any, Final
 
 from boto3 import Session
-from skymantle_boto_buddy import dynamodb
+from skymantle_boto_buddy import EnableCache, dynamodb
 
+from skymantle_mock_data_forge import views
 from skymantle_mock_data_forge.base_forge import BaseForge
+from skymantle_mock_data_forge.destination_resolver import DestinationResolver
+from skymantle_mock_data_forge.key_path_policy import KeyPathErrorPolicy
+from skymantle_mock_data_forge.load_manifest import LoadManifest
 from skymantle_mock_data_forge.models import (
     DataForgeConfigOverride,
     DynamoDbForgeConfig,
     DynamoDbItemConfig,
     ForgeQuery,
 )
+from skymantle_mock_data_forge.query_plan import QueryPlan
+
+logger = logging.getLogger(__name__)
+
+# boto3 sessions aren't thread safe, so DynamoDB resources are created one at a time.
+_resource_lock = threading.Lock()
 
 
 class DynamoDbForge(BaseForge):
+    # BatchWriteItem accepts at most 25 put/delete requests per call.
+    _batch_size: Final[int] = 25
+    _batch_max_retries: Final[int] = 8
+    _batch_backoff_seconds: Final[float] = 0.05
+
     def __init__(
         self,
         forge_id: str,
         config: DynamoDbForgeConfig,
         session: Session = None,
         overrides: list[DataForgeConfigOverride] | None = None,
+        *,
+        batch_threshold: int = 25,
+        destination_ttl: float | None = None,
+        destination_resolver: DestinationResolver | None = None,
+        key_path_error_policy: KeyPathErrorPolicy | None = None,
+        manifest: LoadManifest | None = None,
     ) -> None:
-        super().__init__(forge_id, overrides, session)
+        super().__init__(
+            forge_id,
+            overrides,
+            session,
+            destination_ttl=destination_ttl,
+            destination_resolver=destination_resolver,
+            key_path_error_policy=key_path_error_policy,
+            manifest=manifest,
+        )
 
-        self._config = config
+        # The items are kept once their overrides are applied, so the config doesn't hold or pickle a second copy.
+        self._config = {key: value for key, value in config.items() if key != "items"}
+        self._batch_threshold = batch_threshold
         self._primary_key_names: list[str] = config["primary_key_names"].copy()
         self._items: list[DynamoDbItemConfig] = self._override_data(config["items"])
+        self._index_items(self._items)
 
         # Populate the keys list with the keys from all the items.
         # TODO: Validate key conforms to primary_key_names
-        self._keys: list[dict[str, str]] = []
-        for item in self._items:
-            key = {}
-            for primary_key_name in self._primary_key_names:
-                key[primary_key_name] = item["data"][primary_key_name]
+        self._keys: list[dict[str, str]] = [self._get_key(item) for item in self._items]
+
+        # boto3 resources aren't thread safe, so each thread using the forge has its own DynamoDB resource.
+        self._resources = threading.local()
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state.pop("_resources")
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        super().__setstate__(state)
+        self._resources = threading.local()
+
+    def _get_key(self, item: DynamoDbItemConfig) -> dict[str, str]:
+        key = {}
+        for primary_key_name in self._primary_key_names:
+            key[primary_key_name] = item["data"][primary_key_name]
 
-            self._keys.append(key)
+        return key
 
     def _get_table_name(self):
         resource_config = self._config["table"]
         return self._get_destination_identifier(resource_config)
 
-    def get_data(self, *, query: ForgeQuery, return_source: bool):
-        data = [copy.deepcopy(item) for item in self._items]
+    def get_data(self, *, query: ForgeQuery | QueryPlan, return_source: bool, read_only: bool = False):
+        data = self._items
 
         if query is not None:
             data = self._get_data_query(query, data)
@@ -49,16 +104,233 @@ class DynamoDbForge(BaseForge):
         if not return_source:
             data = [item["data"] for item in data]
 
-        return data
+        if read_only:
+            return [views.read_only(item) for item in data]
+
+        return [copy.deepcopy(item) for item in data]
 
     def add_key(self, key: dict[str, str]) -> None:
         # TODO: Validate key conforms to primary_key_names
         self._keys.append(key)
 
-    def load_data(self) -> None:
-        for item in self._items:
-            dynamodb.put_item_simplified(self._get_table_name(), item["data"], session=self._aws_session)
+    def load_data(self, *, batch: bool | None = None) -> None:
+        """Loads all items into the table. With a manifest, only new or changed items are written, and items
+        removed from the config since the last load are deleted.
+
+        Args:
+            batch (bool | None, optional): Use BatchWriteItem instead of one PutItem per item. Defaults to None,
+                which batches when the number of items is above the forge's batch threshold.
+        """
+        table_name = self._get_table_name()
+        items, removed_keys, hashes = self._get_load_changes(table_name)
+
+        if batch is None:
+            batch = len(items) + len(removed_keys) > self._batch_threshold
+
+        if batch:
+            requests = self._get_load_requests(items, removed_keys)
+            self._batch_write(table_name, requests)
+
+        else:
+            for item in items:
+                self._put_item(table_name, item)
+
+            for key in removed_keys:
+                self._delete_item(table_name, key)
+
+        if hashes is not None:
+            self._manifest.set_hashes(self._forge_id, table_name, hashes)
+
+    def cleanup_data(self, *, batch: bool | None = None) -> None:
+        """Deletes all items, including keys added with add_key, from the table.
+
+        Args:
+            batch (bool | None, optional): Use BatchWriteItem instead of one DeleteItem per key. Defaults to None,
+                which batches when the number of keys is above the forge's batch threshold.
+        """
+        # BatchWriteItem rejects duplicate keys within a request, and deleting a key twice is wasted work.
+        keys = list({tuple(sorted(key.items())): key for key in self._keys}.values())
+
+        if batch is None:
+            batch = len(keys) > self._batch_threshold
+
+        if batch:
+            requests = [{"DeleteRequest": {"Key": key}} for key in keys]
+            self._batch_write(self._get_table_name(), requests)
+
+        else:
+            table_name = self._get_table_name()
+            for key in keys:
+                self._delete_item(table_name, key)
+
+        if self._manifest is not None:
+            self._manifest.remove(self._forge_id)
+
+    async def aload_data(self, *, batch: bool | None = None, max_concurrency: int = 8) -> None:
+        """Async version of load_data, items or batches are written concurrently using threads, each with its own
+        DynamoDB resource.
+
+        Args:
+            batch (bool | None, optional): Use BatchWriteItem instead of one PutItem per item. Defaults to None,
+                which batches when the number of items is above the forge's batch threshold.
+            max_concurrency (int, optional): The maximum number of concurrent requests. Defaults to 8.
+
+        Raises:
+            ExceptionGroup: One or more requests failed.
+        """
+        table_name = await asyncio.to_thread(self._get_table_name)
+        items, removed_keys, hashes = await asyncio.to_thread(self._get_load_changes, table_name)
+
+        if batch is None:
+            batch = len(items) + len(removed_keys) > self._batch_threshold
+
+        if batch:
+            requests = self._get_load_requests(items, removed_keys)
+            calls = self._get_batch_write_calls(table_name, requests)
+        else:
+            calls = [functools.partial(self._put_item, table_name, item) for item in items]
+            calls.extend(functools.partial(self._delete_item, table_name, key) for key in removed_keys)
+
+        errors = await self._run_in_threads(calls, max_concurrency)
+
+        if errors:
+            raise ExceptionGroup(f"Unable to load {len(errors)} requests into table: {table_name}", errors)
+
+        if hashes is not None:
+            await asyncio.to_thread(self._manifest.set_hashes, self._forge_id, table_name, hashes)
+
+    async def acleanup_data(self, *, batch: bool | None = None, max_concurrency: int = 8) -> None:
+        """Async version of cleanup_data, keys or batches are deleted concurrently using threads, each with its own
+        DynamoDB resource.
+
+        Args:
+            batch (bool | None, optional): Use BatchWriteItem instead of one DeleteItem per key. Defaults to None,
+                which batches when the number of keys is above the forge's batch threshold.
+            max_concurrency (int, optional): The maximum number of concurrent requests. Defaults to 8.
+
+        Raises:
+            ExceptionGroup: One or more requests failed.
+        """
+        keys = list({tuple(sorted(key.items())): key for key in self._keys}.values())
+
+        if batch is None:
+            batch = len(keys) > self._batch_threshold
+
+        table_name = await asyncio.to_thread(self._get_table_name)
+        if batch:
+            requests = [{"DeleteRequest": {"Key": key}} for key in keys]
+            calls = self._get_batch_write_calls(table_name, requests)
+        else:
+            calls = [functools.partial(self._delete_item, table_name, key) for key in keys]
+
+        errors = await self._run_in_threads(calls, max_concurrency)
+
+        if errors:
+            raise ExceptionGroup(f"Unable to delete {len(errors)} requests from table: {table_name}", errors)
+
+        if self._manifest is not None:
+            await asyncio.to_thread(self._manifest.remove, self._forge_id)
+
+    def _get_load_changes(
+        self, table_name: str
+    ) -> tuple[list[DynamoDbItemConfig], list[dict[str, str]], dict[str, str] | None]:
+        """Gets the items to put, the keys to delete and the item hashes to record in the manifest."""
+        if self._manifest is None:
+            return self._items, [], None
+
+        items = {self._encode_key(self._get_key(item)): item for item in self._items}
+        hashes = {
+            item_key: LoadManifest.hash_content(json.dumps(item["data"], sort_keys=True, default=str))
+            for item_key, item in items.items()
+        }
+
+        changed, removed = self._diff_manifest(table_name, hashes)
+
+        return (
+            [item for item_key, item in items.items() if item_key in changed],
+            [self._decode_key(item_key) for item_key in removed],
+            hashes,
+        )
+
+    @staticmethod
+    def _encode_key(key: dict[str, Any]) -> str:
+        """Encodes a key for the manifest. Key values are strings, numbers or binary, so a number read as a Decimal
+        is encoded as {"N": "<number>"} and decoded back to a Decimal."""
+
+        def encode_number(value: Any) -> dict[str, str]:
+            if isinstance(value, Decimal):
+                return {"N": str(value)}
+
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+        return json.dumps(key, sort_keys=True, default=encode_number)
+
+    @staticmethod
+    def _decode_key(item_key: str) -> dict[str, Any]:
+        key = json.loads(item_key)
+        return {name: Decimal(value["N"]) if isinstance(value, dict) else value for name, value in key.items()}
+
+    def _get_load_requests(self, items: list[DynamoDbItemConfig], removed_keys: list[dict[str, str]]) -> list[dict]:
+        # BatchWriteItem rejects duplicate keys within a request, so only the last item for each key is put, which is
+        # the item one PutItem per item leaves in the table.
+        items_by_key = {tuple(sorted(self._get_key(item).items())): item for item in items}
+
+        requests = [{"PutRequest": {"Item": item["data"]}} for item in items_by_key.values()]
+        requests.extend({"DeleteRequest": {"Key": key}} for key in removed_keys)
+
+        return requests
+
+    def _get_resource(self) -> Any:
+        """Gets the current thread's DynamoDB resource, such as a forge factory or async worker thread's."""
+        dynamodb_resource = getattr(self._resources, "dynamodb_resource", None)
+
+        if dynamodb_resource is None:
+            with _resource_lock:
+                dynamodb_resource = dynamodb.get_dynamodb_resource(
+                    session=self._aws_session, enable_cache=EnableCache.NO
+                )
+
+            self._resources.dynamodb_resource = dynamodb_resource
+
+        return dynamodb_resource
+
+    def _put_item(self, table_name: str, item: DynamoDbItemConfig) -> None:
+        self._get_resource().Table(table_name).put_item(Item=item["data"])
+
+    def _delete_item(self, table_name: str, key: dict[str, str]) -> None:
+        self._get_resource().Table(table_name).delete_item(Key=key)
+
+    def _get_batch_write_calls(self, table_name: str, requests: list[dict]) -> list[Callable[[], None]]:
+        return [
+            functools.partial(self._batch_write, table_name, requests[start : start + self._batch_size])
+            for start in range(0, len(requests), self._batch_size)
+        ]
+
+    def _batch_write(self, table_name: str, requests: list[dict]) -> None:
+        dynamodb_resource = self._get_resource()
+
+        for start in range(0, len(requests), self._batch_size):
+            batch = requests[start : start + self._batch_size]
+            batch_number = start // self._batch_size + 1
+            started_at = time.perf_counter()
+
+            attempt = 0
+            while batch:
+                if attempt > self._batch_max_retries:
+                    raise Exception(f"Unable to process {len(batch)} batch requests for table: {table_name}")
+
+                if attempt > 0:
+                    time.sleep(self._batch_backoff_seconds * 2 ** (attempt - 1))
+
+                response = dynamodb_resource.batch_write_item(RequestItems={table_name: batch})
+                batch = response.get("UnprocessedItems", {}).get(table_name, [])
+                attempt += 1
 
-    def cleanup_data(self) -> None:
-        for key in self._keys:
-            dynamodb.delete_item(self._get_table_name(), key, session=self._aws_session)
+            logger.debug(
+                "%s: batch %s for table %s completed in %.3fs after %s attempt(s)",
+                self._forge_id,
+                batch_number,
+                table_name,
+                time.perf_counter() - started_at,
+                attempt,
+            )
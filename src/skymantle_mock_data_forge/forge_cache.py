@@ -0,0 +1,208 @@
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import pickle
+import tempfile
+from enum import Enum
+from typing import Any, Final
+
+from skymantle_mock_data_forge.base_forge import BaseForge
+from skymantle_mock_data_forge.models import DataForgeConfigOverride, OverrideType
+
+logger = logging.getLogger(__name__)
+
+
+def _get_package_version() -> str | None:
+    try:
+        return importlib.metadata.version("skymantle_mock_data_forge")
+    except importlib.metadata.PackageNotFoundError:  # no cov
+        return None
+
+
+class ForgeCache:
+    """Stores forges in a directory once their overrides have been applied and their items indexed, keyed by a hash
+    of the forge config and override descriptors. Loading a cached forge skips parsing, validation and overrides.
+
+    Forges from a config file are keyed by a hash of the file, so a warm start doesn't parse the file. An index of
+    the forges in the file is cached with them.
+
+    Forges with CALL_FUNCTION overrides, or with config or override values that can't be serialized to JSON, are not
+    cached, since the hash can't describe what the overrides produce.
+    """
+
+    # Changed whenever the pickled state of the forges changes, so older cache files are not loaded. Cache keys also
+    # include the installed package version, so an upgrade doesn't load forges pickled by another version.
+    _version: Final[int] = 2
+    _package_version: Final[str | None] = _get_package_version()
+    _file_block_size: Final[int] = 1024 * 1024
+
+    def __init__(self, directory: str) -> None:
+        self._directory = directory
+
+    def get_key(
+        self,
+        forge_type: str,
+        forge_id: str,
+        config: dict,
+        overrides: list[DataForgeConfigOverride] | None,
+        *,
+        suppress_key_path_errors: bool,
+        serializer_name: str = "auto",
+    ) -> str | None:
+        """Gets the cache key for a forge, or None when the forge can't be cached.
+
+        Args:
+            forge_type (str): The forge type, either dynamodb or s3.
+            forge_id (str): The forge ID.
+            config (dict): The forge config.
+            overrides (list[DataForgeConfigOverride] | None): The overrides for the forge.
+            suppress_key_path_errors (bool): If key path errors are suppressed while applying the overrides.
+            serializer_name (str, optional): The JSON serializer S3 forges encode json payloads with.
+                Defaults to "auto".
+
+        Returns:
+            str | None: The cache key.
+        """
+        descriptor = self._get_descriptor(
+            [forge_type, forge_id, config, serializer_name],
+            overrides,
+            suppress_key_path_errors=suppress_key_path_errors,
+        )
+
+        if descriptor is None:
+            return None
+
+        return hashlib.sha256(descriptor).hexdigest()
+
+    def get_file_key(
+        self,
+        path: str,
+        overrides: list[DataForgeConfigOverride] | None,
+        *,
+        suppress_key_path_errors: bool,
+        serializer_name: str = "auto",
+    ) -> str | None:
+        """Gets the cache key for the forges in a config file, from the file's content and the overrides, without
+        parsing the file. Returns None when the forges can't be cached.
+
+        Args:
+            path (str): The path to the config file.
+            overrides (list[DataForgeConfigOverride] | None): The overrides for all forges.
+            suppress_key_path_errors (bool): If key path errors are suppressed while applying the overrides.
+            serializer_name (str, optional): The JSON serializer the file is parsed with, since serializers can parse
+                some values differently. Defaults to "auto".
+
+        Returns:
+            str | None: The cache key.
+        """
+        descriptor = self._get_descriptor(
+            ["file", serializer_name], overrides, suppress_key_path_errors=suppress_key_path_errors
+        )
+
+        if descriptor is None:
+            return None
+
+        file_hash = hashlib.sha256(descriptor)
+
+        with open(path, "rb") as file:
+            while block := file.read(self._file_block_size):
+                file_hash.update(block)
+
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def get_forge_key(file_key: str, forge_id: str) -> str:
+        """Gets the cache key for a forge in a config file."""
+        return hashlib.sha256(f"{file_key}:{forge_id}".encode()).hexdigest()
+
+    def load_index(self, file_key: str) -> list[list] | None:
+        """Loads the forge ID, forge type and destination config of each forge in a config file, returns None when
+        the file hasn't been cached."""
+        path = os.path.join(self._directory, f"{file_key}.json")
+
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Unable to load cached forge index %s: %s", path, e)
+            return None
+
+    def save_index(self, file_key: str, forges: list[list]) -> None:
+        """Caches the forge ID, forge type and destination config of each forge in a config file."""
+        os.makedirs(self._directory, exist_ok=True)
+
+        try:
+            data = json.dumps(forges)
+        except (TypeError, ValueError) as e:
+            logger.warning("Unable to cache forge index %s: %s", file_key, e)
+            return
+
+        self._write(f"{file_key}.json", data.encode())
+
+    def load(self, key: str) -> BaseForge | None:
+        """Loads a cached forge, returns None when the forge isn't cached or the cache file can't be read."""
+        path = self._get_path(key)
+
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as file:
+                # Cache files are only written by save, to a directory chosen by the caller.
+                forge = pickle.load(file)  # noqa: S301 # nosec B301
+        except Exception as e:
+            logger.warning("Unable to load cached forge %s: %s", path, e)
+            return None
+
+        return forge if isinstance(forge, BaseForge) else None
+
+    def save(self, key: str, forge: BaseForge) -> None:
+        """Caches a forge. Errors are logged rather than raised, since the forge can still be used."""
+        os.makedirs(self._directory, exist_ok=True)
+
+        try:
+            data = pickle.dumps(forge, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning("Unable to cache forge %s: %s", key, e)
+            return
+
+        self._write(f"{key}.pickle", data)
+
+    def _write(self, filename: str, data: bytes) -> None:
+        # Written to a temporary file first, so concurrent test runs never read a partial cache file.
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+
+        os.replace(temp_path, os.path.join(self._directory, filename))
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.pickle")
+
+    def _get_descriptor(
+        self, values: list, overrides: list[DataForgeConfigOverride] | None, *, suppress_key_path_errors: bool
+    ) -> bytes | None:
+        if any(
+            isinstance(override, dict) and override.get("override_type") == OverrideType.CALL_FUNCTION
+            for override in overrides or []
+        ):
+            return None
+
+        descriptor = [self._version, self._package_version, *values, overrides, suppress_key_path_errors]
+
+        try:
+            return json.dumps(descriptor, sort_keys=True, default=self._serialize_enum).encode()
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _serialize_enum(value: Any) -> str:
+        if isinstance(value, Enum):
+            return f"{type(value).__name__}.{value.name}"
+
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
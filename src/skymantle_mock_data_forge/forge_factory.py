@@ -1,49 +1,301 @@
-import json
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Any
 
 from boto3 import Session
 
+from skymantle_mock_data_forge.base_forge import BaseForge
+from skymantle_mock_data_forge.config_loader import iter_config
+from skymantle_mock_data_forge.destination_resolver import DestinationResolver
 from skymantle_mock_data_forge.dynamodb_forge import DynamoDbForge
+from skymantle_mock_data_forge.forge_cache import ForgeCache
+from skymantle_mock_data_forge.key_path_policy import KeyPathErrorPolicy
+from skymantle_mock_data_forge.load_manifest import LoadManifest
 from skymantle_mock_data_forge.models import (
     DataForgeConfig,
     DataForgeConfigOverride,
     ForgeQuery,
 )
+from skymantle_mock_data_forge.query_plan import QueryPlan
 from skymantle_mock_data_forge.s3_forge import S3Forge
+from skymantle_mock_data_forge.serializers import JsonSerializer, default_serializer
+
+logger = logging.getLogger(__name__)
+
+
+def _build_forge(
+    forge_class: type[BaseForge],
+    forge_id: str,
+    forge_config: dict,
+    forge_overrides: list[DataForgeConfigOverride] | None,
+    *,
+    suppress_key_path_errors: bool,
+    forge_kwargs: dict[str, Any],
+) -> tuple[BaseForge, dict[str, dict[str, int]]]:
+    """Creates a forge in a worker process, the process pool pickles it to send it back."""
+    key_path_error_policy = KeyPathErrorPolicy(suppress=suppress_key_path_errors)
+    forge = forge_class(
+        forge_id=forge_id,
+        config=forge_config,
+        overrides=forge_overrides,
+        key_path_error_policy=key_path_error_policy,
+        **forge_kwargs,
+    )
+
+    return forge, key_path_error_policy.summary()
 
 
 class ForgeFactory:
     def __init__(
         self,
-        config: str | list[DataForgeConfig],
+        config: str | Iterable[DataForgeConfig],
         session: Session = None,
         overrides: list[DataForgeConfigOverride] | None = None,
+        *,
+        prefetch_destinations: bool = False,
+        key_path_error_policy: KeyPathErrorPolicy | None = None,
+        cache_dir: str | None = None,
+        lazy_forges: bool = False,
+        build_processes: int | None = None,
+        manifest_path: str | None = None,
+        serializer: JsonSerializer | None = None,
     ) -> None:
         forges = {"dynamodb": DynamoDbForge, "s3": S3Forge}
+        destinations = {"dynamodb": "table", "s3": "bucket"}
 
-        if isinstance(config, str):
-            with open(config) as file:
-                data = file.read()
-                config = json.loads(data)
+        self._forge_types = list(forges.keys())
+        self._session = session
+
+        # Parses JSON and JSON Lines config files, and encodes S3 json payloads.
+        self._serializer = serializer or default_serializer
+
+        # Shared by all forges, so the summary covers every forge
+        self.key_path_error_policy = key_path_error_policy or KeyPathErrorPolicy.from_environment()
+
+        # Forges are loaded from the cache when the config and overrides haven't changed since they were cached.
+        self._forge_cache = ForgeCache(cache_dir) if cache_dir else None
+
+        # SSM parameters and CloudFormation stack outputs are shared by the factory's forges, and looked up again by
+        # another factory.
+        self._destination_resolver = DestinationResolver()
+
+        # Records what each forge loaded, so later loads only write new or changed items.
+        self._manifest = LoadManifest(manifest_path) if manifest_path else None
 
         self.data_managers: dict[str, DynamoDbForge] = {}
+        resource_configs = []
+
+        # With lazy forges, a forge is only created the first time it's used.
+        self._forge_ids: list[str] = []
+        self._pending_forges: dict[str, tuple] = {}
+        self._forge_locks: dict[str, threading.Lock] = {}
+        self._forge_locks_lock = threading.Lock()
+
+        # Overrides are pure Python, so forges are created in other processes to apply them in parallel.
+        use_processes = not lazy_forges and build_processes is not None and build_processes > 1
+
+        # Forges from a config file are cached by a hash of the file, so a warm start doesn't parse the file.
+        self._config_path = config if isinstance(config, str) else None
+        file_key, cached_index = self._load_cache_index(overrides)
+
+        if cached_index is not None:
+            forge_configs = [
+                (forge_id, forge_type, None, resource_config) for forge_id, forge_type, resource_config in cached_index
+            ]
+        else:
+            # Forge configs in a file are parsed one at a time, so the whole file isn't held in memory.
+            forge_configs = (
+                (forge_id, forge_type, forge_config, forge_config.get(destinations[forge_type]))
+                for forge_id, forge_type, forge_config in self._iter_forge_configs(
+                    config, self._forge_types, self._serializer
+                )
+            )
+
+        index = []
+
+        for forge_id, forge_type, forge_config, resource_config in forge_configs:
+            if forge_id not in self._forge_ids:
+                self._forge_ids.append(forge_id)
+
+            forge_args = (
+                forges[forge_type],
+                forge_type,
+                forge_id,
+                forge_config,
+                self._get_overrides_by_forge_id(overrides, forge_id),
+                None if file_key is None else self._forge_cache.get_forge_key(file_key, forge_id),
+            )
+
+            if lazy_forges or use_processes:
+                self._pending_forges[forge_id] = forge_args
+            else:
+                self.data_managers[forge_id] = self._create_forge(forge_args)
+
+            if resource_config:
+                resource_configs.append(resource_config)
+
+            index.append([forge_id, forge_type, resource_config])
+
+        if file_key is not None and cached_index is None:
+            self._forge_cache.save_index(file_key, index)
+
+        if use_processes:
+            self._create_forges_in_processes(build_processes)
+
+        # Resolve the distinct SSM parameters and CloudFormation stacks up front, rather than one forge at a time.
+        if prefetch_destinations:
+            self._destination_resolver.prefetch(resource_configs, session)
+
+    def _load_cache_index(self, overrides: list[DataForgeConfigOverride] | None) -> tuple[str | None, list | None]:
+        if self._forge_cache is None or self._config_path is None:
+            return None, None
+
+        file_key = self._forge_cache.get_file_key(
+            self._config_path,
+            overrides,
+            suppress_key_path_errors=self.key_path_error_policy.suppress,
+            serializer_name=self._serializer.name,
+        )
+
+        if file_key is None:
+            return None, None
+
+        return file_key, self._forge_cache.load_index(file_key)
+
+    @staticmethod
+    def _iter_forge_configs(
+        config: str | Iterable[DataForgeConfig], forge_types: Iterable[str], serializer: JsonSerializer
+    ) -> Iterator[tuple[str, str, dict]]:
+        if isinstance(config, str):
+            config = iter_config(config, serializer=serializer)
 
         for data_loader_config in config:
-            forge_id = data_loader_config["forge_id"]
+            types = list(set(forge_types).intersection(set(data_loader_config.keys())))
+
+            if len(types) != 1:
+                raise Exception(f"Can only have one of the following per config: {list(forge_types)}")
+
+            yield data_loader_config["forge_id"], types[0], data_loader_config[types[0]]
+
+    def _get_forge_config(self, forge_id: str, forge_type: str) -> dict:
+        """Parses the config file again for a forge listed in the cache index, whose cache file can't be loaded."""
+        forge_config = None
+
+        for current_id, current_type, current_config in self._iter_forge_configs(
+            self._config_path, self._forge_types, self._serializer
+        ):
+            if current_id == forge_id and current_type == forge_type:
+                forge_config = current_config
+
+        if forge_config is None:
+            raise Exception(f"Unable to find forge {forge_id} in config file: {self._config_path}")
+
+        return forge_config
+
+    def _create_forge(self, forge_args: tuple, *, process_executor: ProcessPoolExecutor | None = None):
+        forge_class, forge_type, forge_id, forge_config, forge_overrides, cache_key = forge_args
+        forge_kwargs = {"json_serializer": self._serializer} if forge_type == "s3" else {}
+
+        if cache_key is None and self._forge_cache is not None and forge_config is not None:
+            cache_key = self._forge_cache.get_key(
+                forge_type,
+                forge_id,
+                forge_config,
+                forge_overrides,
+                suppress_key_path_errors=self.key_path_error_policy.suppress,
+                serializer_name=self._serializer.name,
+            )
+
+        if cache_key is not None:
+            forge = self._forge_cache.load(cache_key)
 
-            forge_types = list(set(forges.keys()).intersection(set(data_loader_config.keys())))
+            if isinstance(forge, forge_class):
+                forge._attach(self._session, self.key_path_error_policy, self._manifest, self._destination_resolver)
+                return forge
 
-            if len(forge_types) != 1:
-                raise Exception(f"Can only have one of the following per config: {list(forges.keys())}")
+        if forge_config is None:
+            forge_config = self._get_forge_config(forge_id, forge_type)
 
-            forge_type = forge_types[0]
+        forge = None
 
-            self.data_managers[forge_id] = forges[forge_type](
+        if process_executor is not None:
+            forge = self._create_forge_in_process(
+                process_executor, forge_class, forge_id, forge_config, forge_overrides, forge_kwargs=forge_kwargs
+            )
+
+        if forge is None:
+            forge = forge_class(
                 forge_id=forge_id,
-                config=data_loader_config[forge_type],
-                session=session,
-                overrides=self._get_overrides_by_forge_id(overrides, forge_id),
+                config=forge_config,
+                session=self._session,
+                overrides=forge_overrides,
+                key_path_error_policy=self.key_path_error_policy,
+                manifest=self._manifest,
+                destination_resolver=self._destination_resolver,
+                **forge_kwargs,
+            )
+
+        if cache_key is not None:
+            self._forge_cache.save(cache_key, forge)
+
+        return forge
+
+    def _create_forges_in_processes(self, max_processes: int) -> None:
+        # Each thread waits on one forge created in the process pool, or creates it in this process when the
+        # forge can't be sent to another process. Worker processes are spawned rather than forked, since forking a
+        # process with running threads can deadlock.
+        with (
+            ProcessPoolExecutor(
+                max_workers=max_processes, mp_context=multiprocessing.get_context("spawn")
+            ) as process_executor,
+            ThreadPoolExecutor(max_workers=max_processes) as executor,
+        ):
+            futures = {
+                forge_id: executor.submit(self._create_forge, forge_args, process_executor=process_executor)
+                for forge_id, forge_args in self._pending_forges.items()
+            }
+
+        for forge_id, future in futures.items():
+            self.data_managers[forge_id] = future.result()
+
+        self._pending_forges.clear()
+
+    def _create_forge_in_process(
+        self, process_executor, forge_class, forge_id, forge_config, forge_overrides, *, forge_kwargs
+    ):
+        try:
+            future = process_executor.submit(
+                _build_forge,
+                forge_class,
+                forge_id,
+                forge_config,
+                forge_overrides,
+                suppress_key_path_errors=self.key_path_error_policy.suppress,
+                forge_kwargs=forge_kwargs,
             )
+            forge, key_path_errors = future.result()
+        except BrokenProcessPool as e:
+            # For example when the calling script creates the factory without an `if __name__ == "__main__":` guard,
+            # so the spawned workers run it again and exit.
+            logger.warning("Creating forge %s in process, the process pool stopped: %s", forge_id, e)
+            return None
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            # For example CALL_FUNCTION overrides using lambdas or local functions. Other errors from creating the
+            # forge are raised again when it's created in this process.
+            logger.debug("Creating forge %s in process, it can't be sent to another process: %s", forge_id, e)
+            return None
+
+        forge._attach(self._session, self.key_path_error_policy, self._manifest, self._destination_resolver)
+        self.key_path_error_policy.update(key_path_errors)
+
+        return forge
 
     def _get_overrides_by_forge_id(self, overrides, forge_id):
         forge_overrides = None
@@ -65,24 +317,40 @@ class ForgeFactory:
         Raises:
             Exception: Provided forge ID is not valid.
         """
-        data_manager = self.data_managers.get(forge_id)
+        self._get_data_manager(forge_id).add_key(key)
 
-        if data_manager:
-            data_manager.add_key(key)
-        else:
-            raise Exception(f"{forge_id} not initialized ({','.join(self.data_managers.keys())}).")
+    def compile_query(self, query: ForgeQuery) -> QueryPlan:
+        """Validates and compiles a query, so it can be reused with get_data without being validated again.
+
+        Args:
+            query (ForgeQuery): The query to compile.
+
+        Raises:
+            Exception: The query is not valid.
+
+        Returns:
+            QueryPlan: The compiled query.
+        """
+        return BaseForge.compile_query(query)
 
     def get_data_first_item(
-        self, forge_id: str | None = None, query: ForgeQuery = None, *, default: Any = None, return_source: bool = False
+        self,
+        forge_id: str | None = None,
+        query: ForgeQuery | QueryPlan = None,
+        *,
+        default: Any = None,
+        return_source: bool = False,
+        read_only: bool = False,
     ) -> list[dict]:
         """Gets the first item from the data loaded into forge destination.
         Does not return data created outside of the forge.
 
         Args:
             forge_id (str | None, optional): The forge to add the key too. Defaults to None.
-            query (ForgeQuery, optional): Query forge data tags to limit returned data. Defaults to None.
+            query (ForgeQuery | QueryPlan, optional): Query forge data tags to limit returned data. Defaults to None.
             default (Any, optional): Default value if no items returned. Defaults to None.
             return_source (bool, optional): Include all data from the config file. Defaults to False.
+            read_only (bool, optional): Return a read-only view of the item instead of a copy. Defaults to False.
 
         Raises:
             Exception: Provided forge ID is not valid.
@@ -90,19 +358,26 @@ class ForgeFactory:
         Returns:
             dict: The first or default item
         """
-        data = self.get_data(forge_id, query, return_source=return_source)
+        data = self.get_data(forge_id, query, return_source=return_source, read_only=read_only)
 
         return next(iter(data), default)
 
     def get_data(
-        self, forge_id: str | None = None, query: ForgeQuery = None, *, return_source: bool = False
+        self,
+        forge_id: str | None = None,
+        query: ForgeQuery | QueryPlan = None,
+        *,
+        return_source: bool = False,
+        read_only: bool = False,
     ) -> list[dict]:
         """Gets a copy of the data loaded into forge destination. Does not return data created outside of the forge.
 
         Args:
             forge_id (str | None, optional): When provided will only get data for the specific forge. Defaults to None.
-            query (ForgeQuery, optional): Query forge data tags to limit returned data. Defaults to None.
+            query (ForgeQuery | QueryPlan, optional): Query forge data tags to limit returned data. Defaults to None.
             return_source (bool, optional): Include all data from the config file. Defaults to False.
+            read_only (bool, optional): Return read-only views of the forge data instead of copies, which avoids
+                copying every returned item. Defaults to False.
 
         Raises:
             Exception: Provided forge ID is not valid.
@@ -113,59 +388,204 @@ class ForgeFactory:
         forge_ids = self._get_forge_ids(forge_id)
 
         data = []
-        for forge_id in forge_ids:
-            data_manager = self.data_managers.get(forge_id)
-
-            if data_manager:
-                data.extend(data_manager.get_data(query=query, return_source=return_source))
-            else:
-                raise Exception(f"{forge_id} not initialized ({','.join(self.data_managers.keys())}).")
+        for current_id in forge_ids:
+            data_manager = self._get_data_manager(current_id)
+            data.extend(data_manager.get_data(query=query, return_source=return_source, read_only=read_only))
 
         return data
 
-    def load_data(self, forge_id: str | None = None) -> None:
+    def load_data(self, forge_id: str | None = None, *, max_workers: int | None = None) -> None:
         """Loads all data into forge destinations
 
         Args:
             forge_id (str | None, optional): When provided will only load data for the specific forge. Defaults to None.
+            max_workers (int | None, optional): When greater than 1, forges are loaded concurrently using up to
+                this many threads. Defaults to None.
 
         Raises:
             Exception: Provided forge ID is not valid.
+            ExceptionGroup: One or more forges failed when loading concurrently.
         """
+        self._run_forges(forge_id, "load_data", max_workers)
 
-        forge_ids = self._get_forge_ids(forge_id)
+    def cleanup_data(self, forge_id: str | None = None, *, max_workers: int | None = None) -> None:
+        """Deletes all data from forge destinations
 
-        for forge_id in forge_ids:
-            data_manager = self.data_managers.get(forge_id)
+        Args:
+            forge_id (str | None, optional): When provided will only cleanup the specific forge. Defaults to None.
+            max_workers (int | None, optional): When greater than 1, forges are cleaned up concurrently using up to
+                this many threads. Defaults to None.
 
-            if data_manager:
-                data_manager.load_data()
-            else:
-                raise Exception(f"{forge_id} not initialized ({','.join(self.data_managers.keys())}).")
+        Raises:
+            Exception: Provided forge ID is not valid.
+            ExceptionGroup: One or more forges failed when cleaning up concurrently.
+        """
+        self._run_forges(forge_id, "cleanup_data", max_workers)
 
-    def cleanup_data(self, forge_id: str | None = None) -> None:
-        """Deletes all data from forge destinations
+    async def aget_data(
+        self,
+        forge_id: str | None = None,
+        query: ForgeQuery | QueryPlan = None,
+        *,
+        return_source: bool = False,
+        read_only: bool = False,
+    ) -> list[dict]:
+        """Async version of get_data, forges are created and items are copied in threads.
+
+        Args:
+            forge_id (str | None, optional): When provided will only get data for the specific forge. Defaults to None.
+            query (ForgeQuery | QueryPlan, optional): Query forge data tags to limit returned data. Defaults to None.
+            return_source (bool, optional): Include all data from the config file. Defaults to False.
+            read_only (bool, optional): Return read-only views of the forge data instead of copies. Defaults to False.
+
+        Raises:
+            Exception: Provided forge ID is not valid.
+
+        Returns:
+            list[dict]: A list of stored data
+        """
+        data = []
+        for current_id in self._get_forge_ids(forge_id):
+            data_manager = await asyncio.to_thread(self._get_data_manager, current_id)
+            data.extend(await data_manager.aget_data(query=query, return_source=return_source, read_only=read_only))
+
+        return data
+
+    async def aload_data(self, forge_id: str | None = None, *, max_concurrency: int = 8) -> None:
+        """Async version of load_data. Forges are loaded concurrently, each forge runs up to max_concurrency
+        requests at a time in threads.
+
+        Args:
+            forge_id (str | None, optional): When provided will only load data for the specific forge. Defaults to None.
+            max_concurrency (int, optional): The maximum number of concurrent requests per forge. Defaults to 8.
+
+        Raises:
+            Exception: Provided forge ID is not valid.
+            ExceptionGroup: One or more forges failed.
+        """
+        await self._arun_forges(forge_id, "aload_data", max_concurrency)
+
+    async def acleanup_data(self, forge_id: str | None = None, *, max_concurrency: int = 8) -> None:
+        """Async version of cleanup_data. Forges are cleaned up concurrently, each forge runs up to max_concurrency
+        requests at a time in threads.
 
         Args:
             forge_id (str | None, optional): When provided will only cleanup the specific forge. Defaults to None.
+            max_concurrency (int, optional): The maximum number of concurrent requests per forge. Defaults to 8.
 
         Raises:
             Exception: Provided forge ID is not valid.
+            ExceptionGroup: One or more forges failed.
         """
+        await self._arun_forges(forge_id, "acleanup_data", max_concurrency)
+
+    async def _arun_forges(self, forge_id: str | None, action: str, max_concurrency: int) -> None:
+        forge_ids = self._get_forge_ids(forge_id)
+        timings: dict[str, float] = {}
+
+        # An invalid forge ID is raised on its own, as it is by load_data and cleanup_data.
+        if forge_id is not None:
+            await asyncio.to_thread(self._get_data_manager, forge_id)
+
+        async def run(current_id: str) -> None:
+            started_at = time.perf_counter()
+            try:
+                data_manager = await asyncio.to_thread(self._get_data_manager, current_id)
+                await getattr(data_manager, action)(max_concurrency=max_concurrency)
+            finally:
+                timings[current_id] = time.perf_counter() - started_at
+
+        results = await asyncio.gather(*(run(current_id) for current_id in forge_ids), return_exceptions=True)
+        errors = {
+            current_id: result
+            for current_id, result in zip(forge_ids, results, strict=True)
+            if isinstance(result, BaseException)
+        }
+
+        if errors:
+            for current_id, error in errors.items():
+                error.add_note(f"forge_id: {current_id}")
+
+            raise ExceptionGroup(f"Unable to {action} for forges: {','.join(errors)}", list(errors.values()))
+
+        logger.info(
+            "%s completed for %s forge(s): %s",
+            action,
+            len(timings),
+            ", ".join(f"{current_id}={timings[current_id]:.3f}s" for current_id in forge_ids),
+        )
+
+    def _run_forges(self, forge_id: str | None, action: str, max_workers: int | None) -> None:
         forge_ids = self._get_forge_ids(forge_id)
+        timings: dict[str, float] = {}
+
+        # Lazy forges are created by the thread that runs them, so they're also created concurrently.
+        def run(current_id: str) -> None:
+            started_at = time.perf_counter()
+            try:
+                getattr(self._get_data_manager(current_id), action)()
+            finally:
+                timings[current_id] = time.perf_counter() - started_at
+
+        if max_workers is None or max_workers <= 1 or len(forge_ids) <= 1:
+            for current_id in forge_ids:
+                run(current_id)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {current_id: executor.submit(run, current_id) for current_id in forge_ids}
 
-        for forge_id in forge_ids:
+            errors = {current_id: future.exception() for current_id, future in futures.items() if future.exception()}
+
+            if errors:
+                for current_id, error in errors.items():
+                    error.add_note(f"forge_id: {current_id}")
+
+                raise ExceptionGroup(f"Unable to {action} for forges: {','.join(errors)}", list(errors.values()))
+
+        logger.info(
+            "%s completed for %s forge(s): %s",
+            action,
+            len(timings),
+            ", ".join(f"{current_id}={timing:.3f}s" for current_id, timing in timings.items()),
+        )
+
+    def _get_data_manager(self, forge_id: str) -> DynamoDbForge | S3Forge:
+        data_manager = self.data_managers.get(forge_id)
+
+        if data_manager is None:
+            data_manager = self._create_pending_forge(forge_id)
+
+        if not data_manager:
+            raise Exception(f"{forge_id} not initialized ({','.join(self._forge_ids)}).")
+
+        return data_manager
+
+    def _create_pending_forge(self, forge_id: str) -> DynamoDbForge | S3Forge | None:
+        with self._forge_locks_lock:
+            # Another thread may have created the forge since it was looked up, forges are added to data_managers
+            # before they're removed from the pending forges.
+            if forge_id not in self._pending_forges:
+                return self.data_managers.get(forge_id)
+
+            forge_lock = self._forge_locks.setdefault(forge_id, threading.Lock())
+
+        # Only one thread creates a forge, others wait for it and use the same forge.
+        with forge_lock:
             data_manager = self.data_managers.get(forge_id)
 
-            if data_manager:
-                data_manager.cleanup_data()
-            else:
-                raise Exception(f"{forge_id} not initialized ({','.join(self.data_managers.keys())}).")
+            if data_manager is None:
+                data_manager = self._create_forge(self._pending_forges[forge_id])
+                self.data_managers[forge_id] = data_manager
+
+                with self._forge_locks_lock:
+                    self._pending_forges.pop(forge_id)
+
+        return data_manager
 
     def _get_forge_ids(self, forge_id: str | None) -> list[str]:
         forge_ids: list[str] = []
         if forge_id is None:
-            forge_ids.extend(self.data_managers.keys())
+            forge_ids.extend(self._forge_ids)
         else:
             forge_ids.append(forge_id)
 
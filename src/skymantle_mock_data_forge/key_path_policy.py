@@ -0,0 +1,58 @@
+import os
+import threading
+from collections import Counter
+
+
+class KeyPathErrorPolicy:
+    """Decides whether key path errors found while applying overrides are raised or suppressed, and counts the
+    suppressed errors by forge and key path. A policy can be shared by multiple forges."""
+
+    def __init__(self, *, suppress: bool = True) -> None:
+        self._suppress = suppress
+        self._lock = threading.Lock()
+        self._errors: Counter[tuple[str, str]] = Counter()
+
+    @classmethod
+    def from_environment(cls) -> "KeyPathErrorPolicy":
+        """Creates a policy from the `DATA_FORGE_SUPPRESS_KEY_PATH_ERRORS` environment variable. Errors are
+        suppressed unless it's set to `0`, `false`, `no` or `off`."""
+        suppress_key_path_errors = os.environ.get("DATA_FORGE_SUPPRESS_KEY_PATH_ERRORS", "true")
+        return cls(suppress=suppress_key_path_errors not in ["0", "false", "no", "off"])
+
+    @property
+    def suppress(self) -> bool:
+        return self._suppress
+
+    def handle(self, forge_id: str, key_path: str, message: str) -> None:
+        """Raises the error, or records it when errors are suppressed.
+
+        Args:
+            forge_id (str): The forge applying the override.
+            key_path (str): The key path of the override.
+            message (str): The error message.
+
+        Raises:
+            Exception: Errors are not suppressed.
+        """
+        if not self._suppress:
+            raise Exception(message)
+
+        with self._lock:
+            self._errors[(forge_id, key_path)] += 1
+
+    def update(self, summary: dict[str, dict[str, int]]) -> None:
+        """Adds the errors from another policy's summary, for example one used in another process."""
+        with self._lock:
+            for forge_id, key_paths in summary.items():
+                for key_path, count in key_paths.items():
+                    self._errors[(forge_id, key_path)] += count
+
+    def summary(self) -> dict[str, dict[str, int]]:
+        """Gets the number of suppressed errors for each key path, by forge ID."""
+        summary: dict[str, dict[str, int]] = {}
+
+        with self._lock:
+            for (forge_id, key_path), count in self._errors.items():
+                summary.setdefault(forge_id, {})[key_path] = count
+
+        return summary
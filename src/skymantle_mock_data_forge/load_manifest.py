@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class LoadManifest:
+    """Records a content hash for each item loaded by each forge, and the destination it was loaded into, in a local
+    JSON file. Forges use it to only write new or changed items, and to delete items removed from the config.
+
+    The manifest assumes the destinations are only changed by the forges. If items are changed or deleted some other
+    way, clear the manifest so the next load writes everything again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._forges: dict[str, dict] = {}
+
+        if os.path.exists(path):
+            with open(path) as file:
+                self._forges = json.load(file)
+
+    @staticmethod
+    def hash_content(content: str | bytes) -> str:
+        """Gets the hash of an item's content."""
+        if isinstance(content, str):
+            content = content.encode()
+
+        return hashlib.sha256(content).hexdigest()
+
+    def get_hashes(self, forge_id: str, destination: str) -> dict[str, str]:
+        """Gets the hash of each item last loaded by a forge, by item key. Returns an empty dict when the forge
+        hasn't been loaded, or was loaded into a different destination."""
+        with self._lock:
+            forge = self._forges.get(forge_id)
+
+            if forge is None or forge["destination"] != destination:
+                return {}
+
+            return dict(forge["hashes"])
+
+    def set_hashes(self, forge_id: str, destination: str, hashes: dict[str, str]) -> None:
+        """Records the items loaded by a forge and saves the manifest."""
+        with self._lock:
+            self._forges[forge_id] = {"destination": destination, "hashes": hashes}
+            self._save()
+
+    def remove(self, forge_id: str) -> None:
+        """Removes a forge, for example once its items are cleaned up, and saves the manifest."""
+        with self._lock:
+            if self._forges.pop(forge_id, None) is not None:
+                self._save()
+
+    def clear(self) -> None:
+        """Removes all forges, so the next load writes every item."""
+        with self._lock:
+            self._forges.clear()
+            self._save()
+
+    def _save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Written to a temporary file first, so a failed write doesn't leave a partial manifest.
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump(self._forges, file)
+
+        os.replace(temp_path, self._path)
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Any, TypedDict
+from typing import Any, NotRequired, TypedDict
 
 
 class ForgeQuery(TypedDict):
@@ -46,6 +46,7 @@ class S3ObjectConfig(TypedDict):
 class S3ForgeConfig(TypedDict):
     bucket: ResourceConfig
     s3_objects: list[S3ObjectConfig]
+    skip_unchanged: NotRequired[bool]
 
 
 class DataForgeConfig(TypedDict):
@@ -60,8 +61,14 @@ class OverrideType(Enum):
     CALL_FUNCTION = 2
 
 
+class OverrideContext(Enum):
+    COPY = 0
+    READ_ONLY = 1
+
+
 class DataForgeConfigOverride(TypedDict):
     forge_id: str | None
     key_paths: str | list[str]
     override_type: OverrideType
     override: Any
+    context: NotRequired[OverrideContext]
@@ -0,0 +1,62 @@
+from collections.abc import Hashable, Iterable
+from typing import Any
+
+from skymantle_mock_data_forge.models import ForgeQuery
+
+
+class QueryPlan:
+    """A validated ForgeQuery, normalized into a tuple of (operator, tag key, value) conditions. A plan can be
+    compiled once and passed to get_data in place of the query."""
+
+    __slots__ = ("_conditions", "_key")
+
+    def __init__(self, conditions: tuple[tuple[str, str, Any], ...]) -> None:
+        self._conditions = conditions
+
+        try:
+            self._key: Hashable | None = frozenset(conditions)
+        except TypeError:
+            self._key = None
+
+    @property
+    def conditions(self) -> tuple[tuple[str, str, Any], ...]:
+        return self._conditions
+
+    @property
+    def key(self) -> Hashable | None:
+        """A key that's equal for plans with the same conditions, None when a condition value isn't hashable."""
+        return self._key
+
+    @classmethod
+    def compile(cls, query: ForgeQuery, operators: Iterable[str]) -> "QueryPlan":
+        """Validates and normalizes a query.
+
+        Args:
+            query (ForgeQuery): The query to compile.
+            operators (Iterable[str]): The supported query operators.
+
+        Raises:
+            Exception: The query is not valid.
+
+        Returns:
+            QueryPlan: The compiled query.
+        """
+        operators = list(operators)
+
+        if len(query.keys()) == 0:
+            raise Exception("Missing operator from query")
+
+        if not set(query.keys()).issubset(operators):
+            raise Exception(f"Only the following query operators are supported: {operators}")
+
+        for condition in query.values():
+            if not isinstance(condition, dict):
+                raise Exception("The condition for an operator must be a dict.")
+
+        return cls(
+            tuple(
+                (operator, condition_key, condition_value)
+                for operator, conditions in query.items()
+                for condition_key, condition_value in conditions.items()
+            )
+        )
@@ -1,41 +1,234 @@
+import asyncio
 import base64
 import copy
 import csv
+import functools
+import hashlib
 import io
-import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Final
 
 from boto3 import Session
-from skymantle_boto_buddy import s3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from s3transfer.utils import ChunksizeAdjuster
+from skymantle_boto_buddy import EnableCache, s3
 
+from skymantle_mock_data_forge import views
 from skymantle_mock_data_forge.base_forge import BaseForge
+from skymantle_mock_data_forge.destination_resolver import DestinationResolver
+from skymantle_mock_data_forge.key_path_policy import KeyPathErrorPolicy
+from skymantle_mock_data_forge.load_manifest import LoadManifest
 from skymantle_mock_data_forge.models import (
     DataForgeConfigOverride,
     ForgeQuery,
+    OverrideType,
     S3ForgeConfig,
     S3ObjectConfig,
+    S3ObjectDataConfig,
 )
+from skymantle_mock_data_forge.query_plan import QueryPlan
+from skymantle_mock_data_forge.serializers import JsonSerializer, default_serializer
+
+
+class LazyPayload:
+    """The data config of an S3 object, only copied and overridden when it's uploaded or returned by get_data."""
+
+    __slots__ = ("_resolve", "_source")
+
+    def __init__(
+        self,
+        source: S3ObjectDataConfig,
+        resolve: Callable[[S3ObjectDataConfig], S3ObjectDataConfig] | None = None,
+    ) -> None:
+        self._source = source
+        self._resolve = resolve
+
+    def keys(self):
+        return self._source.keys()
+
+    def resolve(self) -> S3ObjectDataConfig:
+        """Gets the data with overrides applied. When there are no overrides this is the source config,
+        which must not be modified."""
+        return self._source if self._resolve is None else self._resolve(self._source)
+
+    def copy(self) -> S3ObjectDataConfig:
+        return copy.deepcopy(self._source) if self._resolve is None else self._resolve(self._source)
+
+
+def _create_csv(data: list[list[str | int]]) -> str:
+    with io.StringIO() as string_io:
+        csv.writer(string_io).writerows(data)
+        return string_io.getvalue()
+
+
+def _load_file(filename: str) -> bytes:
+    with open(filename, "rb") as file:
+        data = file.read()
+
+    return data
 
 
 class S3Forge(BaseForge):
+    _data_types: Final[tuple[str, ...]] = ("text", "json", "base64", "csv", "file")
+    _encoders: Final[dict[str, Callable[[Any], str | bytes]]] = {
+        "text": lambda data: data,
+        "base64": base64.b64decode,
+        "csv": _create_csv,
+        "file": _load_file,
+    }
+    _upload_max_retries: Final[int] = 3
+    _upload_backoff_seconds: Final[float] = 0.1
+    _multipart_chunksize: Final[int] = 16 * 1024 * 1024
+    _multipart_max_concurrency: Final[int] = 8
+    # DeleteObjects accepts at most 1000 keys per call.
+    _delete_batch_size: Final[int] = 1000
+
     def __init__(
         self,
         forge_id: str,
         config: S3ForgeConfig,
         session: Session = None,
         overrides: list[DataForgeConfigOverride] | None = None,
+        *,
+        destination_ttl: float | None = None,
+        destination_resolver: DestinationResolver | None = None,
+        key_path_error_policy: KeyPathErrorPolicy | None = None,
+        manifest: LoadManifest | None = None,
+        multipart_threshold: int = 64 * 1024 * 1024,
+        lazy_payloads: bool = False,
+        cache_payloads: bool = True,
+        json_serializer: JsonSerializer | None = None,
     ) -> None:
-        super().__init__(forge_id, overrides, session)
+        super().__init__(
+            forge_id,
+            overrides,
+            session,
+            destination_ttl=destination_ttl,
+            destination_resolver=destination_resolver,
+            key_path_error_policy=key_path_error_policy,
+            manifest=manifest,
+        )
+
+        # The objects are kept once their overrides are applied, so the config doesn't hold or pickle a second copy.
+        self._config = {key: value for key, value in config.items() if key != "s3_objects"}
+        self._json_serializer = json_serializer or default_serializer
+
+        # Files at or above the threshold are streamed from disk in parts, rather than read into memory.
+        self._multipart_threshold = multipart_threshold
+        self._transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=self._multipart_chunksize,
+            max_concurrency=self._multipart_max_concurrency,
+        )
 
-        self._config = config
-        self._s3_objects: list[S3ObjectConfig] = self._override_data(config["s3_objects"])
+        if lazy_payloads:
+            self._s3_objects: list[S3ObjectConfig] = self._create_lazy_s3_objects(config["s3_objects"])
+        else:
+            self._s3_objects: list[S3ObjectConfig] = self._override_data(config["s3_objects"])
+
+        self._index_items(self._s3_objects)
         self._keys: list[str] = [s3_object["key"] for s3_object in self._s3_objects]
 
+        # Encoded payloads by object. Lazy payloads are resolved for each upload to keep memory down, so their encoded
+        # payloads aren't kept either.
+        self._cache_payloads = cache_payloads and not lazy_payloads
+        self._encoded_payloads: dict[int, bytes] = {}
+
+    def __getstate__(self) -> dict:
+        # Encoded payloads are cached by object id, which isn't kept when the forge is unpickled.
+        state = super().__getstate__()
+        state["_encoded_payloads"] = {}
+
+        return state
+
     def _get_bucket_name(self):
         resource_config = self._config["bucket"]
         return self._get_destination_identifier(resource_config)
 
-    def get_data(self, *, query: ForgeQuery, return_source: bool):
-        data = [copy.deepcopy(s3_object) for s3_object in self._s3_objects]
+    def _create_lazy_s3_objects(self, s3_objects: list[S3ObjectConfig]) -> list[S3ObjectConfig]:
+        payload_overrides, object_overrides = self._split_payload_overrides()
+
+        # Invalid config is left to _override_data to report. CALL_FUNCTION overrides are applied once up front,
+        # because they may not return the same value each time the payload is used, and their context is the whole
+        # object, including its data.
+        if (
+            payload_overrides is None
+            or not all(isinstance(s3_object, dict) for s3_object in s3_objects)
+            or any(
+                override.get("override_type") == OverrideType.CALL_FUNCTION
+                for override in payload_overrides + object_overrides
+            )
+        ):
+            return self._override_data(s3_objects)
+
+        # A partial of a method, rather than a local function, so the forge can still be pickled.
+        resolve = functools.partial(self._resolve_payload, payload_overrides) if payload_overrides else None
+
+        lazy_s3_objects = self._override_data(
+            [{key: value for key, value in s3_object.items() if key != "data"} for s3_object in s3_objects],
+            object_overrides,
+        )
+
+        for lazy_s3_object, s3_object in zip(lazy_s3_objects, s3_objects, strict=True):
+            if "data" in s3_object:
+                lazy_s3_object["data"] = LazyPayload(s3_object["data"], resolve)
+
+        return lazy_s3_objects
+
+    def _resolve_payload(
+        self, payload_overrides: list[DataForgeConfigOverride], payload: S3ObjectDataConfig
+    ) -> S3ObjectDataConfig:
+        return self._override_data([{"data": payload}], payload_overrides)[0]["data"]
+
+    def _split_payload_overrides(
+        self,
+    ) -> tuple[list[DataForgeConfigOverride] | None, list[DataForgeConfigOverride] | None]:
+        """Splits the overrides into those for key paths under "data" and the rest. Returns None for both when
+        the overrides are invalid."""
+        if self._overrides and not isinstance(self._overrides, list):
+            return None, None
+
+        payload_overrides = []
+        object_overrides = []
+
+        for override in self._overrides or []:
+            key_paths = override.get("key_paths") if isinstance(override, dict) else None
+
+            if isinstance(key_paths, str):
+                key_paths = [key_paths]
+
+            elif not (isinstance(key_paths, list) and all(isinstance(item, str) for item in key_paths)):
+                return None, None
+
+            payload_key_paths = [key_path for key_path in key_paths if key_path.split(".")[0] == "data"]
+            object_key_paths = [key_path for key_path in key_paths if key_path.split(".")[0] != "data"]
+
+            if payload_key_paths:
+                payload_overrides.append({**override, "key_paths": payload_key_paths})
+
+            if object_key_paths:
+                object_overrides.append({**override, "key_paths": object_key_paths})
+
+        return payload_overrides, object_overrides
+
+    def _get_payload(self, s3_object: S3ObjectConfig) -> S3ObjectDataConfig:
+        payload = s3_object["data"]
+        return payload.resolve() if isinstance(payload, LazyPayload) else payload
+
+    def _copy_s3_object(self, s3_object: S3ObjectConfig) -> S3ObjectConfig:
+        return {
+            key: value.copy() if isinstance(value, LazyPayload) else copy.deepcopy(value)
+            for key, value in s3_object.items()
+        }
+
+    def get_data(self, *, query: ForgeQuery | QueryPlan, return_source: bool, read_only: bool = False):
+        data = self._s3_objects
 
         if query is not None:
             data = self._get_data_query(query, data)
@@ -43,42 +236,283 @@ class S3Forge(BaseForge):
         if not return_source:
             data = [{"key": item["key"], "data": item["data"]} for item in data]
 
-        return data
+        if read_only:
+            return [views.read_only({**item, "data": self._get_payload(item)}) for item in data]
+
+        return [self._copy_s3_object(item) for item in data]
 
     def add_key(self, key: str) -> None:
         self._keys.append(key)
 
-    def load_data(self) -> None:
-        def create_csv(data: list[list[str | int]]):
-            with io.StringIO() as string_io:
-                csv.writer(string_io).writerows(data)
-                return string_io.getvalue()
+    def load_data(self, *, max_workers: int | None = None, skip_unchanged: bool | None = None) -> None:
+        """Uploads all objects to the bucket. With a manifest, only new or changed objects are uploaded, and objects
+        removed from the config since the last load are deleted.
+
+        Args:
+            max_workers (int | None, optional): When greater than 1, objects are uploaded concurrently using up to
+                this many threads, each with its own S3 client. Defaults to None.
+            skip_unchanged (bool | None, optional): Skip objects whose ETag in the bucket matches the MD5 of the
+                payload. Defaults to None, which uses the skip_unchanged setting of the forge config.
+
+        Raises:
+            ExceptionGroup: One or more objects failed to upload when uploading concurrently.
+        """
+        bucket_name = self._get_bucket_name()
+        s3_objects, removed_keys, hashes = self._get_load_changes(bucket_name)
+
+        if skip_unchanged is None:
+            skip_unchanged = self._config.get("skip_unchanged", False)
+
+        if skip_unchanged:
+            s3_objects = self._get_changed_objects(bucket_name, s3_objects)
+
+        if max_workers is None or max_workers <= 1:
+            s3_client = s3.get_s3_client(session=self._aws_session)
+
+            for s3_object in s3_objects:
+                self._put_object(s3_client, bucket_name, s3_object)
+
+        else:
+            upload = self._create_threaded_upload(bucket_name)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(upload, s3_object) for s3_object in s3_objects]
+
+            errors = [future.exception() for future in futures if future.exception()]
+
+            if errors:
+                raise ExceptionGroup(f"Unable to upload {len(errors)} objects to bucket: {bucket_name}", errors)
+
+        for start in range(0, len(removed_keys), self._delete_batch_size):
+            keys = removed_keys[start : start + self._delete_batch_size]
+            s3.delete_objects_simplified(bucket_name, keys, session=self._aws_session)
+
+        if hashes is not None:
+            self._manifest.set_hashes(self._forge_id, bucket_name, hashes)
+
+    async def aload_data(self, *, max_concurrency: int = 8, skip_unchanged: bool | None = None) -> None:
+        """Async version of load_data, objects are uploaded concurrently using threads, each with its own S3 client.
+
+        Args:
+            max_concurrency (int, optional): The maximum number of concurrent uploads. Defaults to 8.
+            skip_unchanged (bool | None, optional): Skip objects whose ETag in the bucket matches the MD5 of the
+                payload. Defaults to None, which uses the skip_unchanged setting of the forge config.
+
+        Raises:
+            ExceptionGroup: One or more objects failed to upload.
+        """
+        bucket_name = await asyncio.to_thread(self._get_bucket_name)
+        s3_objects, removed_keys, hashes = await asyncio.to_thread(self._get_load_changes, bucket_name)
+
+        if skip_unchanged is None:
+            skip_unchanged = self._config.get("skip_unchanged", False)
+
+        if skip_unchanged:
+            s3_objects = await asyncio.to_thread(self._get_changed_objects, bucket_name, s3_objects)
+
+        upload = self._create_threaded_upload(bucket_name)
+
+        calls = [functools.partial(upload, s3_object) for s3_object in s3_objects]
+        calls.extend(self._get_delete_calls(bucket_name, removed_keys))
+        errors = await self._run_in_threads(calls, max_concurrency)
+
+        if errors:
+            raise ExceptionGroup(f"Unable to upload {len(errors)} objects to bucket: {bucket_name}", errors)
+
+        if hashes is not None:
+            await asyncio.to_thread(self._manifest.set_hashes, self._forge_id, bucket_name, hashes)
+
+    async def acleanup_data(self, *, max_concurrency: int = 8) -> None:
+        """Async version of cleanup_data, objects are deleted concurrently using threads, in batches of up to 1000.
+
+        Args:
+            max_concurrency (int, optional): The maximum number of concurrent delete requests. Defaults to 8.
+
+        Raises:
+            ExceptionGroup: One or more delete requests failed.
+        """
+        bucket_name = await asyncio.to_thread(self._get_bucket_name)
+
+        calls = self._get_delete_calls(bucket_name, self._keys)
+        errors = await self._run_in_threads(calls, max_concurrency)
+
+        if errors:
+            raise ExceptionGroup(f"Unable to delete {len(errors)} batches from bucket: {bucket_name}", errors)
+
+        if self._manifest is not None:
+            await asyncio.to_thread(self._manifest.remove, self._forge_id)
+
+    def _get_changed_objects(self, bucket_name: str, s3_objects: list[S3ObjectConfig]) -> list[S3ObjectConfig]:
+        """Gets the objects that aren't in the bucket, or whose ETag doesn't match their payload. The bucket is
+        listed once under the common prefix of the keys, rather than requesting each object's metadata."""
+        if not s3_objects:
+            return s3_objects
+
+        s3_client = s3.get_s3_client(session=self._aws_session)
+        # S3 prefixes are compared character by character, not by path component.
+        prefix = os.path.commonprefix([s3_object["key"] for s3_object in s3_objects])  # noqa: RUF071
+
+        existing_objects: dict[str, tuple[str, int]] = {}
+        for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+            for content in page.get("Contents", []):
+                existing_objects[content["Key"]] = (content["ETag"].strip('"'), content["Size"])
+
+        return [
+            s3_object
+            for s3_object in s3_objects
+            if s3_object["key"] not in existing_objects
+            or not self._matches_etag(s3_object, *existing_objects[s3_object["key"]])
+        ]
+
+    def _matches_etag(self, s3_object: S3ObjectConfig, etag: str, size: int) -> bool:
+        data_type = self._get_data_type(s3_object)
+        payload = self._get_payload(s3_object)
+
+        if data_type == "file":
+            filename = payload["file"]
+            return os.path.getsize(filename) == size and self._get_file_etag(filename) == etag
+
+        data = self._get_encoded_payload(s3_object)
+        return hashlib.md5(data, usedforsecurity=False).hexdigest() == etag
+
+    def _get_file_etag(self, filename: str) -> str:
+        """Gets the ETag S3 gives a file uploaded by this forge. Files uploaded in parts have the MD5 of their parts'
+        MD5s, followed by the number of parts."""
+        if not self._is_multipart_file(filename):
+            file_hash = hashlib.md5(usedforsecurity=False)
 
-        def load_file(filename: str):
             with open(filename, "rb") as file:
-                data = file.read()
+                while chunk := file.read(self._multipart_chunksize):
+                    file_hash.update(chunk)
+
+            return file_hash.hexdigest()
+
+        # The transfer manager uses larger parts when a file would need more than the maximum number of parts.
+        chunksize = ChunksizeAdjuster().adjust_chunksize(self._multipart_chunksize, os.path.getsize(filename))
+        part_digests = []
+
+        with open(filename, "rb") as file:
+            while chunk := file.read(chunksize):
+                part_digests.append(hashlib.md5(chunk, usedforsecurity=False).digest())
+
+        return f"{hashlib.md5(b''.join(part_digests), usedforsecurity=False).hexdigest()}-{len(part_digests)}"
+
+    def _get_delete_calls(self, bucket_name: str, keys: list[str]) -> list[Callable[[], None]]:
+        return [
+            functools.partial(
+                s3.delete_objects_simplified,
+                bucket_name,
+                keys[start : start + self._delete_batch_size],
+                session=self._aws_session,
+            )
+            for start in range(0, len(keys), self._delete_batch_size)
+        ]
 
+    def _get_load_changes(self, bucket_name: str) -> tuple[list[S3ObjectConfig], list[str], dict[str, str] | None]:
+        """Gets the objects to upload, the keys to delete and the object hashes to record in the manifest."""
+        if self._manifest is None:
+            return self._s3_objects, [], None
+
+        s3_objects = {s3_object["key"]: s3_object for s3_object in self._s3_objects}
+        hashes = {key: self._get_content_hash(s3_object) for key, s3_object in s3_objects.items()}
+
+        changed, removed = self._diff_manifest(bucket_name, hashes)
+
+        return [s3_object for key, s3_object in s3_objects.items() if key in changed], removed, hashes
+
+    def _get_content_hash(self, s3_object: S3ObjectConfig) -> str:
+        data_type = self._get_data_type(s3_object)
+        payload = self._get_payload(s3_object)
+
+        # Files aren't read to be hashed, a file is treated as changed when its size or modified time changes.
+        if data_type == "file":
+            file_stat = os.stat(payload["file"])
+            return LoadManifest.hash_content(
+                f"file:{os.path.abspath(payload['file'])}:{file_stat.st_size}:{file_stat.st_mtime_ns}"
+            )
+
+        return LoadManifest.hash_content(f"{data_type}:".encode() + self._get_encoded_payload(s3_object))
+
+    def _create_threaded_upload(self, bucket_name: str) -> Callable[[S3ObjectConfig], None]:
+        # boto3 sessions aren't thread safe, so clients are created one at a time and then reused by their worker.
+        client_lock = threading.Lock()
+        worker = threading.local()
+
+        def upload(s3_object: S3ObjectConfig) -> None:
+            if not hasattr(worker, "s3_client"):
+                with client_lock:
+                    worker.s3_client = s3.get_s3_client(session=self._aws_session, enable_cache=EnableCache.NO)
+
+            self._put_object(worker.s3_client, bucket_name, s3_object)
+
+        return upload
+
+    def _put_object(self, s3_client, bucket_name: str, s3_object: S3ObjectConfig) -> None:
+        key = s3_object["key"]
+        data_type = self._get_data_type(s3_object)
+        payload = self._get_payload(s3_object)
+
+        if data_type == "file" and self._is_multipart_file(payload["file"]):
+            filename = payload["file"]
+
+            def upload():
+                s3_client.upload_file(filename, bucket_name, key, Config=self._transfer_config)
+
+        else:
+            data = self._get_encoded_payload(s3_object)
+
+            def upload():
+                s3_client.put_object(Bucket=bucket_name, Key=key, Body=data)
+
+        attempt = 0
+        while True:
+            try:
+                upload()
+                return
+
+            except (BotoCoreError, ClientError, S3UploadFailedError):
+                if attempt >= self._upload_max_retries:
+                    raise
+
+                time.sleep(self._upload_backoff_seconds * 2**attempt)
+                attempt += 1
+
+    def _is_multipart_file(self, filename: str) -> bool:
+        return os.path.getsize(filename) >= self._multipart_threshold
+
+    def _get_encoded_payload(self, s3_object: S3ObjectConfig) -> bytes:
+        """Gets the encoded payload of an object. Overrides are only applied when the forge is created, so payloads
+        are cached for the life of the forge, except files, which are read from disk for each upload."""
+        data_type = self._get_data_type(s3_object)
+
+        # Objects are kept by the forge, so their id is stable while they're cached.
+        cache_key = id(s3_object)
+        data = self._encoded_payloads.get(cache_key)
+
+        if data is not None:
             return data
 
-        data_type_map = {
-            "text": (lambda data: data),
-            "json": (lambda data: json.dumps(data)),
-            "base64": (lambda data: base64.b64decode(data)),
-            "csv": create_csv,
-            "file": load_file,
-        }
+        encoder = self._json_serializer.dumps if data_type == "json" else self._encoders[data_type]
+        data = encoder(self._get_payload(s3_object)[data_type])
+
+        if isinstance(data, str):
+            data = data.encode()
 
-        for s3_object in self._s3_objects:
-            data_types = list(set(data_type_map.keys()).intersection(set(s3_object["data"].keys())))
+        if self._cache_payloads and data_type != "file":
+            self._encoded_payloads[cache_key] = data
 
-            if len(data_types) != 1:
-                raise Exception(f"Can only have one of the following per s3 config: {list(data_type_map.keys())}")
+        return data
+
+    def _get_data_type(self, s3_object: S3ObjectConfig) -> str:
+        data_types = list(set(self._data_types).intersection(set(s3_object["data"].keys())))
 
-            data_type = data_types[0]
-            data_func = data_type_map[data_type]
-            data = data_func(s3_object["data"][data_type])
+        if len(data_types) != 1:
+            raise Exception(f"Can only have one of the following per s3 config: {list(self._data_types)}")
 
-            s3.put_object(self._get_bucket_name(), s3_object["key"], data, session=self._aws_session)
+        return data_types[0]
 
     def cleanup_data(self) -> None:
         s3.delete_objects_simplified(self._get_bucket_name(), self._keys, session=self._aws_session)
+
+        if self._manifest is not None:
+            self._manifest.remove(self._forge_id)
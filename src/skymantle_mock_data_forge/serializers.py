@@ -0,0 +1,90 @@
+import json
+from typing import Any, Final
+
+try:
+    import orjson
+except ImportError:  # no cov
+    orjson = None
+
+
+class JsonSerializer:
+    """Parses and serializes JSON with the standard library."""
+
+    name = "json"
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+
+class OrjsonSerializer(JsonSerializer):
+    """Parses and serializes JSON with orjson. The output is compact, without a space after separators, so S3 json
+    payloads are not byte for byte the same as the standard library's.
+
+    Depending on the orjson version, integers outside the 64 bit range are parsed as floats."""
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise Exception("orjson is required for the orjson serializer, install skymantle_mock_data_forge[orjson]")
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+
+class AutoJsonSerializer(JsonSerializer):
+    """Parses JSON with orjson when it's installed, falling back to the standard library for JSON orjson rejects, such
+    as NaN and Infinity, and for JSON with a run of 19 or more digits, which may be an integer outside the 64 bit range
+    that orjson would parse as a float. Serializes with the standard library, so output doesn't change when orjson is
+    installed."""
+
+    name = "auto"
+    # Maps digits to "0" and every other byte to a space, so a run of digits can be found with a substring search,
+    # which is much faster than a regular expression.
+    _digit_table: Final[bytes] = bytes(ord("0") if ord("0") <= byte <= ord("9") else ord(" ") for byte in range(256))
+    _long_digits: Final[bytes] = b"0" * 19
+
+    def loads(self, data: str | bytes) -> Any:
+        if orjson is not None and not self._has_long_digits(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+
+        return json.loads(data)
+
+    def _has_long_digits(self, data: str | bytes) -> bool:
+        if isinstance(data, str):
+            data = data.encode(errors="surrogatepass")
+
+        return self._long_digits in data.translate(self._digit_table)
+
+
+def get_json_serializer(name: str = "auto") -> JsonSerializer:
+    """Gets a JSON serializer by name.
+
+    Args:
+        name (str, optional): One of `auto`, `json` or `orjson`. Defaults to "auto".
+
+    Raises:
+        Exception: The serializer isn't supported, or orjson isn't installed.
+
+    Returns:
+        JsonSerializer: The serializer.
+    """
+    serializers = {"auto": AutoJsonSerializer, "json": JsonSerializer, "orjson": OrjsonSerializer}
+
+    if name not in serializers:
+        raise Exception(f"Only the following JSON serializers are supported: {list(serializers.keys())}")
+
+    return serializers[name]()
+
+
+# Used when a serializer isn't provided
+default_serializer = AutoJsonSerializer()
@@ -0,0 +1,91 @@
+from typing import Final
+
+
+class TagIndex:
+    """An inverted index from tag key and tag value to the positions of the items with that tag. Items are
+    added in order, so an item's position is its index in the forge's list of items.
+
+    Each tag key also has a trigram index over its distinct values, used to find the values containing a substring.
+    Items with a tag value that isn't a string or list of strings aren't indexed under that key, their positions are
+    kept so the forge can report them when they're queried.
+    """
+
+    _ngram_size: Final[int] = 3
+
+    def __init__(self) -> None:
+        self._positions: dict[str, dict[str, set[int]]] = {}
+        self._trigrams: dict[str, dict[str, set[str]]] = {}
+        self._invalid_positions: dict[str, set[int]] = {}
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def add(self, item: dict) -> int:
+        """Adds an item's tags to the index.
+
+        Args:
+            item (dict): The item, tags are read from its "tags" key.
+
+        Returns:
+            int: The position of the item.
+        """
+        position = self._size
+        self._size += 1
+
+        for key, value in item.get("tags", {}).items():
+            values = value if isinstance(value, list) else [value]
+
+            if not all(isinstance(list_item, str) for list_item in values):
+                self._invalid_positions.setdefault(key, set()).add(position)
+                continue
+
+            key_positions = self._positions.setdefault(key, {})
+            for list_item in values:
+                if list_item not in key_positions:
+                    key_positions[list_item] = set()
+                    self._add_trigrams(key, list_item)
+
+                key_positions[list_item].add(position)
+
+        return position
+
+    def get_positions(self, key: str, value: str) -> set[int]:
+        """Gets the positions of the items with a tag value equal to value."""
+        return self._positions.get(key, {}).get(value, set())
+
+    def get_values(self, key: str) -> dict[str, set[int]]:
+        """Gets all values of a tag, with the positions of the items that have each value."""
+        return self._positions.get(key, {})
+
+    def get_invalid_positions(self, key: str) -> set[int]:
+        """Gets the positions of the items with a tag value that isn't a string or list of strings."""
+        return self._invalid_positions.get(key, set())
+
+    def get_positions_like(self, key: str, value: str) -> set[int]:
+        """Gets the positions of the items with a tag value that contains value."""
+        key_positions = self._positions.get(key, {})
+
+        if len(value) < self._ngram_size:
+            candidates = key_positions.keys()
+        else:
+            key_trigrams = self._trigrams.get(key, {})
+            trigram_values = [key_trigrams.get(trigram, set()) for trigram in self._get_trigrams(value)]
+            candidates = set.intersection(*sorted(trigram_values, key=len))
+
+        positions = set()
+        for candidate in candidates:
+            if value in candidate:
+                positions.update(key_positions[candidate])
+
+        return positions
+
+    def _add_trigrams(self, key: str, value: str) -> None:
+        key_trigrams = self._trigrams.setdefault(key, {})
+
+        for trigram in self._get_trigrams(value):
+            key_trigrams.setdefault(trigram, set()).add(value)
+
+    def _get_trigrams(self, value: str) -> set[str]:
+        return {value[index : index + self._ngram_size] for index in range(len(value) - self._ngram_size + 1)}
@@ -0,0 +1,87 @@
+import copy
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+
+class ReadOnlyDict(Mapping):
+    """A read-only view of a dict. Nested dicts and lists are wrapped in read-only views when accessed."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict) -> None:
+        self._data = data
+
+    def __getitem__(self, key: Any) -> Any:
+        return read_only(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ReadOnlyDict):
+            other = other._data
+
+        return self._data == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyDict({self._data!r})"
+
+    def copy(self) -> dict:
+        """Gets a mutable deep copy of the data."""
+        return copy.deepcopy(self._data)
+
+
+class ReadOnlyList(Sequence):
+    """A read-only view of a list. Nested dicts and lists are wrapped in read-only views when accessed."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: list) -> None:
+        self._data = data
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return ReadOnlyList(self._data[index])
+
+        return read_only(self._data[index])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ReadOnlyList):
+            other = other._data
+
+        return self._data == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyList({self._data!r})"
+
+    def copy(self) -> list:
+        """Gets a mutable deep copy of the data."""
+        return copy.deepcopy(self._data)
+
+
+def read_only(value: Any) -> Any:
+    """Wraps dicts and lists in read-only views without copying them, other values are returned as is.
+
+    Args:
+        value (Any): The value to wrap.
+
+    Returns:
+        Any: A ReadOnlyDict, ReadOnlyList or the original value.
+    """
+    if isinstance(value, dict):
+        return ReadOnlyDict(value)
+
+    if isinstance(value, list):
+        return ReadOnlyList(value)
+
+    return value
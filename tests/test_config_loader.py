@@ -0,0 +1,207 @@
+import json
+
+import pytest
+from pytest_mock import MockerFixture
+
+from skymantle_mock_data_forge.config_loader import iter_config, main, write_config
+from skymantle_mock_data_forge.serializers import get_json_serializer
+
+
+def test_iter_config():
+    with open("tests/data/forge_config.json") as file:
+        expected = json.load(file)
+
+    data_forge_configs = iter_config("tests/data/forge_config.json")
+
+    assert not isinstance(data_forge_configs, list)
+    assert list(data_forge_configs) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64])
+def test_iter_config_small_chunks(tmp_path, chunk_size):
+    config = [
+        {"forge_id": f"some_config_{index}", "s3": {"bucket": {"name": "some_bucket"}, "items": [{"number": 12345}]}}
+        for index in range(5)
+    ]
+
+    path = tmp_path / "forge_config.json"
+    path.write_text(json.dumps(config, indent=2))
+
+    assert list(iter_config(str(path), chunk_size=chunk_size)) == config
+
+
+@pytest.mark.parametrize("data", ["[]", " [ ] ", "\n[\n]\n"])
+def test_iter_config_empty(tmp_path, data):
+    path = tmp_path / "forge_config.json"
+    path.write_text(data)
+
+    assert list(iter_config(str(path))) == []
+
+
+@pytest.mark.parametrize("data", ["", "{}", '["some_config"]'])
+def test_iter_config_not_a_list(tmp_path, data):
+    path = tmp_path / "forge_config.json"
+    path.write_text(data)
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert str(e.value) == "The config file must contain a list of DataForgeConfig"
+
+
+@pytest.mark.parametrize("data", ["[{}", '[{"forge_id": "some_config"} {}]', '[{"forge_id": ]', "[{},]"])
+def test_iter_config_invalid(tmp_path, data):
+    path = tmp_path / "forge_config.json"
+    path.write_text(data)
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path), chunk_size=4))
+
+    assert str(e.value) == f"Invalid JSON in config file: {path}"
+
+
+def test_iter_config_json_lines(tmp_path):
+    with open("tests/data/forge_config.json") as file:
+        expected = json.load(file)
+
+    path = tmp_path / "forge_config.jsonl"
+    path.write_text("\n".join(json.dumps(data_forge_config) for data_forge_config in expected) + "\n\n")
+
+    assert list(iter_config(str(path))) == expected
+
+
+def test_iter_config_json_lines_invalid(tmp_path):
+    path = tmp_path / "forge_config.jsonl"
+    path.write_text('{"forge_id": "some_config"}\n{"forge_id": \n')
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert str(e.value) == f"Invalid JSON in config file: {path} on line: 2"
+
+
+def test_iter_config_json_lines_not_a_config(tmp_path):
+    path = tmp_path / "forge_config.jsonl"
+    path.write_text('["some_config"]\n')
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert str(e.value) == "Each line of the config file must be a DataForgeConfig"
+
+
+@pytest.mark.parametrize("extension", ["json", "jsonl", "msgpack"])
+def test_convert_config(tmp_path, extension):
+    if extension == "msgpack":
+        pytest.importorskip("msgpack")
+
+    with open("tests/data/forge_config.json") as file:
+        expected = json.load(file)
+
+    path = tmp_path / f"forge_config.{extension}"
+    main(["tests/data/forge_config.json", str(path)])
+
+    assert list(iter_config(str(path))) == expected
+
+
+def test_iter_config_msgpack_not_a_config(tmp_path):
+    msgpack = pytest.importorskip("msgpack")
+
+    path = tmp_path / "forge_config.msgpack"
+    path.write_bytes(msgpack.packb(["some_config"]))
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert str(e.value) == "Each value of the config file must be a DataForgeConfig"
+
+
+@pytest.mark.parametrize("data", [b"\xc1", "truncated"])
+def test_iter_config_msgpack_invalid(tmp_path, data):
+    msgpack = pytest.importorskip("msgpack")
+
+    if data == "truncated":
+        data = msgpack.packb({"forge_id": "some_config"}) + msgpack.packb({"forge_id": "some_config"})[:-4]
+
+    path = tmp_path / "forge_config.msgpack"
+    path.write_bytes(data)
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert str(e.value) == f"Invalid MessagePack in config file: {path}"
+
+
+def test_iter_config_msgpack_large_values(tmp_path, mocker: MockerFixture):
+    msgpack = pytest.importorskip("msgpack")
+
+    path = tmp_path / "forge_config.msgpack"
+    write_config(str(path), [{"forge_id": "some_config"}])
+
+    mock_unpacker = mocker.patch.object(msgpack, "Unpacker", wraps=msgpack.Unpacker)
+    assert list(iter_config(str(path))) == [{"forge_id": "some_config"}]
+    assert mock_unpacker.call_args.kwargs["max_buffer_size"] == 0
+
+    mock_unpacker = mocker.patch.object(msgpack, "Unpacker")
+    mock_unpacker.return_value.__iter__.side_effect = msgpack.exceptions.BufferFull()
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert str(e.value) == f"Invalid MessagePack in config file: {path}"
+
+
+def test_iter_config_msgpack_not_installed(tmp_path, mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.config_loader.msgpack", None)
+
+    path = tmp_path / "forge_config.msgpack"
+    path.write_bytes(b"")
+
+    with pytest.raises(Exception) as e:
+        list(iter_config(str(path)))
+
+    assert (
+        str(e.value) == "msgpack is required for MessagePack config files, install skymantle_mock_data_forge[msgpack]"
+    )
+
+
+@pytest.mark.parametrize("filename", ["forge_config.json", "forge_config.jsonl"])
+def test_iter_config_serializer(tmp_path, mocker: MockerFixture, filename):
+    config = [{"forge_id": "some_config", "dynamodb": {"table": {"name": "some_table"}, "items": []}}]
+    path = tmp_path / filename
+    write_config(str(path), config)
+
+    serializer = get_json_serializer("json")
+    mock_loads = mocker.spy(serializer, "loads")
+
+    assert list(iter_config(str(path), serializer=serializer)) == config
+    assert mock_loads.call_count == 1
+
+
+def test_iter_config_large_json_is_streamed(tmp_path, mocker: MockerFixture):
+    config = [{"forge_id": f"some_config_{index}", "s3": {"bucket": {"name": "some_bucket"}}} for index in range(5)]
+    path = tmp_path / "forge_config.json"
+    path.write_text(json.dumps(config))
+
+    serializer = get_json_serializer("json")
+    mock_loads = mocker.spy(serializer, "loads")
+
+    assert list(iter_config(str(path), chunk_size=16, serializer=serializer)) == config
+    assert [call.args[0] for call in mock_loads.call_args_list] == [json.dumps(value) for value in config]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 4096])
+def test_iter_config_brackets_in_strings_and_deep_nesting(tmp_path, chunk_size):
+    nested = "some_value"
+    for index in range(20):
+        nested = [{"level": index, "value": nested}]
+
+    config = [
+        {"forge_id": 'some "config" with ]}, [{ and \\', "s3": {"bucket": {"name": "some_bucket\\"}}},
+        {"forge_id": "some_nested_config", "s3": {"items": nested, "text": '\u00e9 "]'}},
+    ]
+
+    path = tmp_path / "forge_config.json"
+    path.write_text(json.dumps(config))
+
+    assert list(iter_config(str(path), chunk_size=chunk_size)) == config
@@ -0,0 +1,275 @@
+import json
+import os
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+from pytest_mock import MockerFixture
+
+from skymantle_mock_data_forge import destination_resolver
+from skymantle_mock_data_forge.destination_resolver import DestinationResolver
+from skymantle_mock_data_forge.dynamodb_forge import DynamoDbForge
+from skymantle_mock_data_forge.forge_factory import ForgeFactory
+
+
+@pytest.fixture(autouse=True)
+def environment(mocker: MockerFixture):
+    return mocker.patch.dict(
+        os.environ,
+        {"AWS_DEFAULT_REGION": "ca-central-1", "BOTO_BUDDY_DISABLE_CACHE": "true"},
+    )
+
+
+def create_stack(stack_name: str, outputs: dict[str, str]):
+    cfn_template = {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Description": "sample template",
+        "Resources": {},
+        "Outputs": {key: {"Value": value} for key, value in outputs.items()},
+    }
+
+    cfn_client = boto3.client("cloudformation")
+    cfn_client.create_stack(StackName=stack_name, TemplateBody=json.dumps(cfn_template))
+
+
+@mock_aws
+def test_get_stack_outputs_cached(mocker: MockerFixture):
+    create_stack("some_stack", {"db_name": "some_table"})
+
+    spy = mocker.spy(destination_resolver.cloudformation, "get_stack_outputs")
+
+    resolver = DestinationResolver()
+    assert resolver.get_stack_outputs("some_stack") == {"db_name": "some_table"}
+    assert resolver.get_stack_outputs("some_stack") == {"db_name": "some_table"}
+
+    assert spy.call_count == 1
+
+    resolver.clear()
+    resolver.get_stack_outputs("some_stack")
+
+    assert spy.call_count == 2
+
+
+@mock_aws
+def test_get_parameter_cached_by_region(mocker: MockerFixture):
+    boto3.client("ssm", region_name="ca-central-1").put_parameter(Name="some_key", Type="String", Value="ca")
+    boto3.client("ssm", region_name="us-east-1").put_parameter(Name="some_key", Type="String", Value="us")
+
+    resolver = DestinationResolver()
+    assert resolver.get_parameter("some_key") == "ca"
+    assert resolver.get_parameter("some_key", boto3.Session(region_name="us-east-1")) == "us"
+
+    mocker.patch.dict(os.environ, {"AWS_DEFAULT_REGION": "us-east-1"})
+    assert resolver.get_parameter("some_key") == "us"
+
+
+def test_max_age_and_invalidate(mocker: MockerFixture):
+    mock_get_parameter = mocker.patch(
+        "skymantle_mock_data_forge.destination_resolver.ssm.get_parameter",
+        side_effect=["value_a", "value_b", "value_c"],
+    )
+    mock_monotonic = mocker.patch("skymantle_mock_data_forge.destination_resolver.time.monotonic", return_value=100.0)
+
+    resolver = DestinationResolver()
+    assert resolver.get_parameter("some_key") == "value_a"
+
+    mock_monotonic.return_value = 159.0
+    assert resolver.get_parameter("some_key", max_age=60) == "value_a"
+
+    mock_monotonic.return_value = 160.0
+    assert resolver.get_parameter("some_key", max_age=60) == "value_b"
+    assert resolver.get_parameter("some_key") == "value_b"
+
+    resolver.invalidate({"name": "some_table"})
+    resolver.invalidate({"stack": {"name": "some_stack", "output": "db_name"}})
+    assert resolver.get_parameter("some_key") == "value_b"
+
+    resolver.invalidate({"ssm": "some_key"})
+    assert resolver.get_parameter("some_key") == "value_c"
+    assert mock_get_parameter.call_count == 3
+
+
+@mock_aws
+@pytest.mark.parametrize("destination_ttl", [None, 0])
+def test_forge_refreshes_shared_cache(destination_ttl):
+    resolver = DestinationResolver()
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_ssm_key", Type="String", Value="table_a")
+
+    data_loader_config = {"table": {"ssm": "some_ssm_key"}, "primary_key_names": ["PK"], "items": []}
+
+    manager = DynamoDbForge(
+        "some-config", data_loader_config, destination_ttl=destination_ttl, destination_resolver=resolver
+    )
+    other_manager = DynamoDbForge(
+        "other-config", data_loader_config, destination_ttl=destination_ttl, destination_resolver=resolver
+    )
+
+    assert manager._get_table_name() == "table_a"
+    assert other_manager._get_table_name() == "table_a"
+
+    ssm_client.put_parameter(Name="some_ssm_key", Type="String", Value="table_b", Overwrite=True)
+
+    if destination_ttl is None:
+        assert manager._get_table_name() == "table_a"
+        manager.invalidate_destination_identifier()
+
+    assert manager._get_table_name() == "table_b"
+
+    # Other forges keep their own cached value until they're invalidated or it expires.
+    if destination_ttl is None:
+        assert other_manager._get_table_name() == "table_a"
+        other_manager.invalidate_destination_identifier()
+
+    assert other_manager._get_table_name() == "table_b"
+
+
+def test_concurrent_lookups_merged(mocker: MockerFixture):
+    def slow_get_parameter(name, session):
+        time.sleep(0.1)
+        return f"{name}_value"
+
+    mock_get_parameter = mocker.patch(
+        "skymantle_mock_data_forge.destination_resolver.ssm.get_parameter", side_effect=slow_get_parameter
+    )
+
+    resolver = DestinationResolver()
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(resolver.get_parameter("some_key"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["some_key_value"] * 5
+    mock_get_parameter.assert_called_once()
+
+
+def test_failed_lookup_not_cached(mocker: MockerFixture):
+    mock_get_parameter = mocker.patch(
+        "skymantle_mock_data_forge.destination_resolver.ssm.get_parameter",
+        side_effect=[Exception("some error"), "some_value"],
+    )
+
+    resolver = DestinationResolver()
+
+    with pytest.raises(Exception) as e:
+        resolver.get_parameter("some_key")
+
+    assert str(e.value) == "some error"
+    assert resolver.get_parameter("some_key") == "some_value"
+    assert mock_get_parameter.call_count == 2
+
+
+@mock_aws
+def test_prefetch(mocker: MockerFixture):
+    create_stack("some_stack", {"db_name": "some_table", "bucket_name": "some_bucket"})
+    boto3.client("ssm").put_parameter(Name="some_key", Type="String", Value="some_table")
+
+    cfn_spy = mocker.spy(destination_resolver.cloudformation, "get_stack_outputs")
+    ssm_spy = mocker.spy(destination_resolver.ssm, "get_parameter")
+
+    resolver = DestinationResolver()
+    resolver.prefetch(
+        [
+            {"name": "some_table"},
+            {"ssm": "some_key"},
+            {"stack": {"name": "some_stack", "output": "db_name"}},
+            {"stack": {"name": "some_stack", "output": "bucket_name"}},
+            {"stack": {"name": "missing_stack", "output": "bucket_name"}},
+        ]
+    )
+
+    assert cfn_spy.call_count == 2
+    assert ssm_spy.call_count == 1
+
+    resolver.get_parameter("some_key")
+    resolver.get_stack_outputs("some_stack")
+
+    assert cfn_spy.call_count == 2
+    assert ssm_spy.call_count == 1
+
+
+def test_forge_factory_prefetch(mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.forge_factory.DynamoDbForge")
+    mocker.patch("skymantle_mock_data_forge.forge_factory.S3Forge")
+    mock_prefetch = mocker.patch.object(DestinationResolver, "prefetch", autospec=True)
+
+    data_forge_config = [
+        {
+            "forge_id": "some_config_1",
+            "dynamodb": {
+                "table": {"stack": {"name": "some_stack", "output": "db_name"}},
+                "primary_key_names": ["PK"],
+                "items": [],
+            },
+        },
+        {
+            "forge_id": "some_config_2",
+            "s3": {"bucket": {"ssm": "some_key"}, "s3_objects": []},
+        },
+    ]
+
+    ForgeFactory(data_forge_config)
+    mock_prefetch.assert_not_called()
+
+    forge_factory = ForgeFactory(data_forge_config, prefetch_destinations=True)
+    mock_prefetch.assert_called_once_with(
+        forge_factory._destination_resolver,
+        [{"stack": {"name": "some_stack", "output": "db_name"}}, {"ssm": "some_key"}],
+        None,
+    )
+
+
+def test_forge_factory_shares_resolver(mocker: MockerFixture):
+    mock_get_parameter = mocker.patch(
+        "skymantle_mock_data_forge.destination_resolver.ssm.get_parameter", side_effect=["table_a", "table_b"]
+    )
+
+    data_forge_config = [
+        {
+            "forge_id": f"some_config_{index}",
+            "dynamodb": {"table": {"ssm": "some_ssm_key"}, "primary_key_names": ["PK"], "items": []},
+        }
+        for index in range(2)
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config)
+    assert [forge._get_table_name() for forge in forge_factory.data_managers.values()] == ["table_a", "table_a"]
+
+    # Another factory doesn't reuse the first factory's lookups, so it sees the changed parameter.
+    forge_factory = ForgeFactory(data_forge_config)
+    assert [forge._get_table_name() for forge in forge_factory.data_managers.values()] == ["table_b", "table_b"]
+    assert mock_get_parameter.call_count == 2
+
+
+def test_forge_factory_resolves_changed_parameter():
+    data_forge_config = [
+        {
+            "forge_id": "some_config",
+            "dynamodb": {
+                "table": {"ssm": "some_ssm_key"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key"}}],
+            },
+        }
+    ]
+
+    for table_name in ["table_a", "table_b"]:
+        with mock_aws():
+            dynamodb_client = boto3.client("dynamodb")
+            dynamodb_client.create_table(
+                BillingMode="PAY_PER_REQUEST",
+                TableName=table_name,
+                AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+                KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+            )
+            boto3.client("ssm").put_parameter(Name="some_ssm_key", Type="String", Value=table_name)
+
+            ForgeFactory(data_forge_config).load_data()
+
+            assert dynamodb_client.scan(TableName=table_name, Select="COUNT")["Count"] == 1
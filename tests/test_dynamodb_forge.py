@@ -1,13 +1,19 @@
+import asyncio
 import json
 import os
+import threading
 import uuid
+from decimal import Decimal
 
 import boto3
 import pytest
 from moto import mock_aws
 from pytest_mock import MockerFixture
+from skymantle_boto_buddy import EnableCache
 
+from skymantle_mock_data_forge import destination_resolver
 from skymantle_mock_data_forge.dynamodb_forge import DynamoDbForge
+from skymantle_mock_data_forge.load_manifest import LoadManifest
 from skymantle_mock_data_forge.models import OverrideType
 
 
@@ -322,3 +328,462 @@ def test_override():
 
     data = manager.get_data(query=None, return_source=True)
     assert data == [{"data": {"PK": pk, "Description": "Some description 1"}}]
+
+
+@mock_aws
+def test_load_data_batch(caplog):
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": f"some_key_{i}", "Description": f"Some description {i}"}} for i in range(60)],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+
+    with caplog.at_level("DEBUG", logger="skymantle_mock_data_forge.dynamodb_forge"):
+        manager.load_data()
+
+    response = dynamodb_client.scan(TableName="some_table", Select="COUNT")
+    assert response["Count"] == 60
+
+    batch_logs = [record for record in caplog.records if "batch" in record.getMessage()]
+    assert len(batch_logs) == 3
+
+
+def test_load_data_batch_unprocessed_items(mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.dynamodb_forge.time.sleep")
+    mock_resource = mocker.patch("skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource")
+
+    unprocessed = {"PutRequest": {"Item": {"PK": "some_key_1"}}}
+    mock_resource.return_value.batch_write_item.side_effect = [
+        {"UnprocessedItems": {"some_table": [unprocessed]}},
+        {"UnprocessedItems": {}},
+    ]
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": "some_key_0"}}, {"data": {"PK": "some_key_1"}}],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    manager.load_data(batch=True)
+
+    calls = mock_resource.return_value.batch_write_item.call_args_list
+    assert len(calls) == 2
+    assert calls[1].kwargs == {"RequestItems": {"some_table": [unprocessed]}}
+
+
+def test_load_data_batch_unprocessed_items_exhausted(mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.dynamodb_forge.time.sleep")
+    mock_resource = mocker.patch("skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource")
+
+    unprocessed = {"PutRequest": {"Item": {"PK": "some_key_0"}}}
+    mock_resource.return_value.batch_write_item.return_value = {"UnprocessedItems": {"some_table": [unprocessed]}}
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": "some_key_0"}}],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+
+    with pytest.raises(Exception) as e:
+        manager.load_data(batch=True)
+
+    assert str(e.value) == "Unable to process 1 batch requests for table: some_table"
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_load_data_batch_dedupes_keys(mocker: MockerFixture, asynchronous):
+    mock_resource = mocker.patch("skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource")
+    mock_resource.return_value.batch_write_item.return_value = {"UnprocessedItems": {}}
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK", "SK"],
+        "items": [
+            {"data": {"PK": "some_key_0", "SK": "some_sort_key", "Description": "Some description 0"}},
+            {"data": {"PK": "some_key_1", "SK": "some_sort_key", "Description": "Some description 1"}},
+            {"data": {"SK": "some_sort_key", "PK": "some_key_0", "Description": "Some description 2"}},
+        ],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+
+    if asynchronous:
+        asyncio.run(manager.aload_data(batch=True))
+    else:
+        manager.load_data(batch=True)
+
+    mock_resource.return_value.batch_write_item.assert_called_once_with(
+        RequestItems={
+            "some_table": [
+                {
+                    "PutRequest": {
+                        "Item": {"SK": "some_sort_key", "PK": "some_key_0", "Description": "Some description 2"}
+                    }
+                },
+                {
+                    "PutRequest": {
+                        "Item": {"PK": "some_key_1", "SK": "some_sort_key", "Description": "Some description 1"}
+                    }
+                },
+            ]
+        }
+    )
+
+
+@mock_aws
+def test_cleanup_data_batch():
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": f"some_key_{i}", "Description": f"Some description {i}"}} for i in range(60)],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    manager.load_data()
+
+    dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "some_key_60"}})
+    manager.add_key({"PK": "some_key_60"})
+    manager.add_key({"PK": "some_key_60"})
+    manager.add_key({"PK": "some_key_0"})
+
+    manager.cleanup_data()
+
+    response = dynamodb_client.scan(TableName="some_table", Select="COUNT")
+    assert response["Count"] == 0
+
+
+def test_cleanup_data_batch_dedupes_keys(mocker: MockerFixture):
+    mock_resource = mocker.patch("skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource")
+    mock_resource.return_value.batch_write_item.return_value = {"UnprocessedItems": {}}
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK", "SK"],
+        "items": [{"data": {"PK": "some_key_0", "SK": "some_sort_key"}}],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    manager.add_key({"SK": "some_sort_key", "PK": "some_key_0"})
+    manager.add_key({"PK": "some_key_1", "SK": "some_sort_key"})
+
+    manager.cleanup_data(batch=True)
+
+    mock_resource.return_value.batch_write_item.assert_called_once_with(
+        RequestItems={
+            "some_table": [
+                {"DeleteRequest": {"Key": {"PK": "some_key_0", "SK": "some_sort_key"}}},
+                {"DeleteRequest": {"Key": {"PK": "some_key_1", "SK": "some_sort_key"}}},
+            ]
+        }
+    )
+
+
+@mock_aws
+def test_load_data_resolves_table_name_once(mocker: MockerFixture):
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_ssm_key", Type="String", Value="some_table")
+
+    spy = mocker.spy(destination_resolver.ssm, "get_parameter")
+
+    data_loader_config = {
+        "table": {"ssm": "some_ssm_key"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": f"some_key_{i}"}} for i in range(3)],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    manager.load_data()
+    manager.cleanup_data()
+
+    assert spy.call_count == 1
+
+    manager.invalidate_destination_identifier()
+    manager.load_data()
+
+    assert spy.call_count == 2
+
+
+@mock_aws
+def test_destination_identifier_ttl(mocker: MockerFixture):
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_ssm_key", Type="String", Value="some_table")
+
+    mock_monotonic = mocker.patch("skymantle_mock_data_forge.base_forge.time.monotonic", return_value=100.0)
+
+    data_loader_config = {
+        "table": {"ssm": "some_ssm_key"},
+        "primary_key_names": ["PK"],
+        "items": [],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config, destination_ttl=60)
+    assert manager._get_table_name() == "some_table"
+
+    ssm_client.put_parameter(Name="some_ssm_key", Type="String", Value="some_other_table", Overwrite=True)
+
+    mock_monotonic.return_value = 159.0
+    assert manager._get_table_name() == "some_table"
+
+    mock_monotonic.return_value = 160.0
+    assert manager._get_table_name() == "some_other_table"
+
+
+def test_get_data_read_only():
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [
+            {"tags": {"tests": "test_1"}, "data": {"PK": "some_key_1", "Description": "Some description 1"}},
+            {"tags": {"tests": "test_2"}, "data": {"PK": "some_key_2", "Description": "Some description 2"}},
+        ],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    data = manager.get_data(query={"StringEquals": {"tests": "test_2"}}, return_source=False, read_only=True)
+
+    assert data == [{"PK": "some_key_2", "Description": "Some description 2"}]
+
+    with pytest.raises(TypeError):
+        data[0]["PK"] = "some_other_key"
+
+
+def test_get_data_returns_copies():
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    manager.get_data(query=None, return_source=False)[0]["PK"] = "some_other_key"
+
+    assert manager.get_data(query=None, return_source=False) == [
+        {"PK": "some_key_1", "Description": "Some description 1"}
+    ]
+
+
+def test_get_data_query_indexed():
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [
+            {"tags": {"tests": ["test_1", "test_2"], "type": "a"}, "data": {"PK": "some_key_1"}},
+            {"tags": {"tests": "test_2", "type": "b"}, "data": {"PK": "some_key_2"}},
+            {"tags": {"tests": ["test_2", "test_3"], "type": "a"}, "data": {"PK": "some_key_3"}},
+            {"data": {"PK": "some_key_4"}},
+        ],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+
+    query = {"StringEquals": {"tests": "test_2", "type": "a"}}
+    assert manager.get_data(query=query, return_source=False) == [{"PK": "some_key_1"}, {"PK": "some_key_3"}]
+
+    query = {"StringEquals": {"type": "a"}, "StringLike": {"tests": "_3"}}
+    assert manager.get_data(query=query, return_source=False) == [{"PK": "some_key_3"}]
+
+    query = {"StringEquals": {"tests": "test_4"}}
+    assert manager.get_data(query=query, return_source=False) == []
+
+    query = {"StringEquals": {}}
+    assert len(manager.get_data(query=query, return_source=False)) == 4
+
+
+@mock_aws
+@pytest.mark.parametrize("batch", [True, False])
+def test_aload_and_acleanup_data(batch):
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": f"some_key_{i}", "Description": f"Some description {i}"}} for i in range(60)],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    asyncio.run(manager.aload_data(batch=batch, max_concurrency=4))
+
+    response = dynamodb_client.scan(TableName="some_table", Select="COUNT")
+    assert response["Count"] == 60
+
+    asyncio.run(manager.acleanup_data(batch=batch, max_concurrency=4))
+
+    response = dynamodb_client.scan(TableName="some_table", Select="COUNT")
+    assert response["Count"] == 0
+
+
+def test_aload_data_errors(mocker: MockerFixture):
+    mock_resource = mocker.patch("skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource")
+    mock_resource.return_value.Table.return_value.put_item.side_effect = [None, Exception("Some error")]
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": f"some_key_{i}"}} for i in range(2)],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+
+    with pytest.raises(ExceptionGroup) as e:
+        asyncio.run(manager.aload_data(max_concurrency=1))
+
+    assert str(e.value) == "Unable to load 1 requests into table: some_table (1 sub-exception)"
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_aload_and_acleanup_data_resource_per_thread(mocker: MockerFixture, batch):
+    resource_threads = {}
+
+    def get_dynamodb_resource(**kwargs):
+        resource = mocker.MagicMock()
+
+        def record_thread(**kwargs):
+            resource_threads.setdefault(id(resource), set()).add(threading.get_ident())
+            return {"UnprocessedItems": {}}
+
+        resource.Table.return_value.put_item.side_effect = record_thread
+        resource.Table.return_value.delete_item.side_effect = record_thread
+        resource.batch_write_item.side_effect = record_thread
+
+        return resource
+
+    mock_resource = mocker.patch(
+        "skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource", side_effect=get_dynamodb_resource
+    )
+
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [{"data": {"PK": f"some_key_{i}"}} for i in range(100)],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    asyncio.run(manager.aload_data(batch=batch, max_concurrency=4))
+    asyncio.run(manager.acleanup_data(batch=batch, max_concurrency=4))
+
+    assert all(call.kwargs["enable_cache"] == EnableCache.NO for call in mock_resource.call_args_list)
+    assert len(resource_threads) == mock_resource.call_count
+    assert all(len(threads) == 1 for threads in resource_threads.values())
+
+
+@mock_aws
+def test_load_data_manifest(tmp_path, mocker: MockerFixture):
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    manifest = LoadManifest(str(tmp_path / "manifest.json"))
+    items = [{"data": {"PK": f"some_key_{i}", "Description": f"Some description {i}"}} for i in range(3)]
+
+    manager = DynamoDbForge(
+        "some-config", {"table": {"name": "some_table"}, "primary_key_names": ["PK"], "items": items}, manifest=manifest
+    )
+    manager.load_data()
+
+    response = dynamodb_client.scan(TableName="some_table", Select="COUNT")
+    assert response["Count"] == 3
+
+    # Change one item and remove another
+    items = [items[0], {"data": {"PK": "some_key_1", "Description": "Changed"}}]
+    manager = DynamoDbForge(
+        "some-config", {"table": {"name": "some_table"}, "primary_key_names": ["PK"], "items": items}, manifest=manifest
+    )
+
+    spy_put = mocker.spy(manager, "_put_item")
+    spy_delete = mocker.spy(manager, "_delete_item")
+    manager.load_data()
+
+    assert spy_put.call_count == 1
+    assert spy_delete.call_count == 1
+
+    response = dynamodb_client.scan(TableName="some_table")
+    assert sorted(item["PK"]["S"] for item in response["Items"]) == ["some_key_0", "some_key_1"]
+
+    response = dynamodb_client.get_item(TableName="some_table", Key={"PK": {"S": "some_key_1"}})
+    assert response["Item"]["Description"] == {"S": "Changed"}
+
+    manager.cleanup_data()
+
+    assert manifest.get_hashes("some-config", "some_table") == {}
+    assert dynamodb_client.scan(TableName="some_table", Select="COUNT")["Count"] == 0
+
+
+@mock_aws
+def test_load_data_manifest_numeric_key(tmp_path):
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "N"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    manifest = LoadManifest(str(tmp_path / "manifest.json"))
+    items = [{"data": {"PK": Decimal(f"{i}.5"), "Description": f"Some description {i}"}} for i in range(3)]
+
+    manager = DynamoDbForge(
+        "some-config", {"table": {"name": "some_table"}, "primary_key_names": ["PK"], "items": items}, manifest=manifest
+    )
+    manager.load_data()
+
+    assert sorted(manifest.get_hashes("some-config", "some_table")) == [
+        '{"PK": {"N": "0.5"}}',
+        '{"PK": {"N": "1.5"}}',
+        '{"PK": {"N": "2.5"}}',
+    ]
+
+    # Remove an item, its key is decoded from the manifest to delete it
+    manager = DynamoDbForge(
+        "some-config",
+        {"table": {"name": "some_table"}, "primary_key_names": ["PK"], "items": items[:2]},
+        manifest=manifest,
+    )
+    manager.load_data()
+
+    response = dynamodb_client.scan(TableName="some_table")
+    assert sorted(item["PK"]["N"] for item in response["Items"]) == ["0.5", "1.5"]
@@ -0,0 +1,224 @@
+import json
+import os
+import pickle
+
+import boto3
+import pytest
+from pytest_mock import MockerFixture
+
+from skymantle_mock_data_forge.base_forge import BaseForge
+from skymantle_mock_data_forge.config_loader import iter_config
+from skymantle_mock_data_forge.dynamodb_forge import DynamoDbForge
+from skymantle_mock_data_forge.forge_cache import ForgeCache
+from skymantle_mock_data_forge.forge_factory import ForgeFactory
+from skymantle_mock_data_forge.models import OverrideType
+from skymantle_mock_data_forge.s3_forge import S3Forge
+from skymantle_mock_data_forge.serializers import get_json_serializer
+
+
+@pytest.fixture(autouse=True)
+def environment(mocker: MockerFixture):
+    return mocker.patch.dict(
+        os.environ,
+        {"AWS_DEFAULT_REGION": "ca-central-1", "BOTO_BUDDY_DISABLE_CACHE": "true"},
+    )
+
+
+def get_config():
+    return [
+        {
+            "forge_id": "some_config",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [
+                    {"tags": {"test": "one"}, "data": {"PK": "some_key_1", "Description": "Some description 1"}},
+                    {"tags": {"test": "two"}, "data": {"PK": "some_key_2", "Description": "Some description 2"}},
+                ],
+            },
+        },
+        {
+            "forge_id": "some_s3_config",
+            "s3": {
+                "bucket": {"name": "some_bucket"},
+                "s3_objects": [{"key": "some_key", "data": {"text": "some text"}}],
+            },
+        },
+    ]
+
+
+def test_load_from_cache(tmp_path, mocker: MockerFixture):
+    overrides = [{"key_paths": "data.Description", "override_type": OverrideType.REPLACE_VALUE, "override": "new"}]
+
+    forge_factory = ForgeFactory(get_config(), overrides=overrides, cache_dir=str(tmp_path))
+    expected = forge_factory.get_data("some_config", {"StringEquals": {"test": "two"}})
+
+    assert len(os.listdir(tmp_path)) == 2
+
+    spy = mocker.spy(BaseForge, "_override_data")
+    session = boto3.Session()
+
+    forge_factory = ForgeFactory(get_config(), session, overrides=overrides, cache_dir=str(tmp_path))
+
+    assert spy.call_count == 0
+    assert forge_factory.get_data("some_config", {"StringEquals": {"test": "two"}}) == expected
+    assert forge_factory.get_data("some_s3_config") == [{"key": "some_key", "data": {"text": "some text"}}]
+    assert forge_factory.data_managers["some_config"]._aws_session is session
+    assert forge_factory.data_managers["some_config"].key_path_error_policy is forge_factory.key_path_error_policy
+
+
+def test_cache_key_changes(tmp_path, mocker: MockerFixture):
+    overrides = [{"key_paths": "data.Description", "override_type": OverrideType.REPLACE_VALUE, "override": "new"}]
+
+    ForgeFactory(get_config(), overrides=overrides, cache_dir=str(tmp_path))
+
+    spy = mocker.spy(BaseForge, "_override_data")
+
+    overrides[0]["override"] = "newer"
+    forge_factory = ForgeFactory(get_config(), overrides=overrides, cache_dir=str(tmp_path))
+
+    assert spy.call_count == 2
+    assert len(os.listdir(tmp_path)) == 4
+    assert forge_factory.get_data("some_config")[0] == {"PK": "some_key_1", "Description": "newer"}
+
+
+def test_call_function_not_cached(tmp_path):
+    overrides = [
+        {
+            "forge_id": "some_config",
+            "key_paths": "data.Description",
+            "override_type": OverrideType.CALL_FUNCTION,
+            "override": lambda key, value, context: value.upper(),
+        }
+    ]
+
+    forge_factory = ForgeFactory(get_config(), overrides=overrides, cache_dir=str(tmp_path))
+
+    assert len(os.listdir(tmp_path)) == 1
+    assert forge_factory.get_data("some_config")[0] == {"PK": "some_key_1", "Description": "SOME DESCRIPTION 1"}
+
+
+def test_invalid_cache_file(tmp_path, caplog):
+    cache = ForgeCache(str(tmp_path))
+    config = get_config()[0]
+
+    key = cache.get_key("dynamodb", "some_config", config["dynamodb"], None, suppress_key_path_errors=True)
+    (tmp_path / f"{key}.pickle").write_bytes(b"not a pickle")
+
+    forge_factory = ForgeFactory([config], cache_dir=str(tmp_path))
+
+    assert "Unable to load cached forge" in caplog.text
+    assert len(forge_factory.get_data("some_config")) == 2
+    assert isinstance(cache.load(key), DynamoDbForge)
+
+
+def test_cache_key_includes_package_version(tmp_path, mocker: MockerFixture):
+    cache = ForgeCache(str(tmp_path))
+    config = get_config()[0]["dynamodb"]
+
+    key = cache.get_key("dynamodb", "some_config", config, None, suppress_key_path_errors=True)
+
+    mocker.patch.object(ForgeCache, "_package_version", "0.0.0")
+    assert cache.get_key("dynamodb", "some_config", config, None, suppress_key_path_errors=True) != key
+
+
+def test_unserializable_config_not_cached(tmp_path):
+    cache = ForgeCache(str(tmp_path))
+    overrides = [{"key_paths": "data.Description", "override_type": OverrideType.REPLACE_VALUE, "override": object()}]
+
+    assert cache.get_key("dynamodb", "some_config", {}, overrides, suppress_key_path_errors=True) is None
+
+
+def test_pickle_excludes_session():
+    session = boto3.Session()
+    config = get_config()[0]["dynamodb"]
+
+    forge = DynamoDbForge("some_config", config, session)
+    forge._get_destination_identifier(config["table"])
+
+    loaded_forge = pickle.loads(pickle.dumps(forge))  # noqa: S301
+
+    assert loaded_forge._aws_session is None
+    assert loaded_forge._destination_identifiers == {}
+    assert loaded_forge.get_data(query=None, return_source=True) == forge.get_data(query=None, return_source=True)
+
+
+def test_load_from_cache_file(tmp_path, mocker: MockerFixture):
+    config_path = tmp_path / "forge_config.json"
+    config_path.write_text(json.dumps(get_config()))
+    cache_dir = str(tmp_path / "cache")
+
+    overrides = [{"key_paths": "data.Description", "override_type": OverrideType.REPLACE_VALUE, "override": "new"}]
+
+    forge_factory = ForgeFactory(str(config_path), overrides=overrides, cache_dir=cache_dir)
+    expected = forge_factory.get_data()
+
+    # An index of the forges in the file, and one cache file per forge
+    assert len(os.listdir(cache_dir)) == 3
+
+    mock_iter_config = mocker.patch("skymantle_mock_data_forge.forge_factory.iter_config", wraps=iter_config)
+    spy = mocker.spy(BaseForge, "_override_data")
+
+    forge_factory = ForgeFactory(str(config_path), overrides=overrides, cache_dir=cache_dir)
+
+    mock_iter_config.assert_not_called()
+    assert spy.call_count == 0
+    assert forge_factory._forge_ids == ["some_config", "some_s3_config"]
+    assert forge_factory.get_data() == expected
+
+    config = get_config()
+    config[0]["dynamodb"]["items"].pop()
+    config_path.write_text(json.dumps(config))
+
+    forge_factory = ForgeFactory(str(config_path), overrides=overrides, cache_dir=cache_dir)
+
+    mock_iter_config.assert_called_once()
+    assert forge_factory.get_data("some_config") == [{"PK": "some_key_1", "Description": "new"}]
+
+
+def test_load_from_cache_file_missing_forge(tmp_path, mocker: MockerFixture):
+    config_path = tmp_path / "forge_config.json"
+    config_path.write_text(json.dumps(get_config()))
+    cache_dir = tmp_path / "cache"
+
+    ForgeFactory(str(config_path), cache_dir=str(cache_dir), lazy_forges=True)
+    assert len(os.listdir(cache_dir)) == 1
+
+    mock_iter_config = mocker.patch("skymantle_mock_data_forge.forge_factory.iter_config", wraps=iter_config)
+
+    # Forges listed in the index without a cache file are found by parsing the file again
+    forge_factory = ForgeFactory(str(config_path), cache_dir=str(cache_dir), lazy_forges=True)
+    mock_iter_config.assert_not_called()
+
+    assert forge_factory.get_data("some_s3_config") == [{"key": "some_key", "data": {"text": "some text"}}]
+    mock_iter_config.assert_called_once()
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_load_from_cache_file_serializer(tmp_path, mocker: MockerFixture):
+    config_path = tmp_path / "forge_config.json"
+    config_path.write_text(json.dumps(get_config()))
+    cache_dir = str(tmp_path / "cache")
+
+    ForgeFactory(str(config_path), cache_dir=cache_dir)
+
+    mock_iter_config = mocker.patch("skymantle_mock_data_forge.forge_factory.iter_config", wraps=iter_config)
+
+    # Serializers can parse some values differently, so forges parsed with another serializer aren't reused
+    ForgeFactory(str(config_path), cache_dir=cache_dir, serializer=get_json_serializer("json"))
+    mock_iter_config.assert_called_once()
+
+    ForgeFactory(str(config_path), cache_dir=cache_dir, serializer=get_json_serializer("json"))
+    mock_iter_config.assert_called_once()
+
+
+def test_pickle_excludes_config_items():
+    config = get_config()
+
+    dynamodb_forge = pickle.loads(pickle.dumps(DynamoDbForge("some_config", config[0]["dynamodb"])))  # noqa: S301
+    s3_forge = pickle.loads(pickle.dumps(S3Forge("some_s3_config", config[1]["s3"])))  # noqa: S301
+
+    assert "items" not in dynamodb_forge._config
+    assert "s3_objects" not in s3_forge._config
+    assert len(dynamodb_forge.get_data(query=None, return_source=False)) == 2
+    assert len(s3_forge.get_data(query=None, return_source=False)) == 1
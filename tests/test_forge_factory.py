@@ -1,10 +1,16 @@
-from unittest.mock import MagicMock
+import asyncio
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import ANY, AsyncMock, MagicMock
 
 import pytest
 from pytest_mock import MockerFixture
+from skymantle_boto_buddy import EnableCache
 
 from skymantle_mock_data_forge.forge_factory import ForgeFactory
 from skymantle_mock_data_forge.models import OverrideType
+from skymantle_mock_data_forge.serializers import get_json_serializer
 
 
 @pytest.fixture()
@@ -35,7 +41,15 @@ def test_forge_init(mock_dynamodb_forge):
 
     forge_id = data_forge_config[0]["forge_id"]
     dynamodb = data_forge_config[0]["dynamodb"]
-    mock_dynamodb_forge.assert_called_once_with(forge_id=forge_id, config=dynamodb, session=None, overrides=None)
+    mock_dynamodb_forge.assert_called_once_with(
+        forge_id=forge_id,
+        config=dynamodb,
+        session=None,
+        overrides=None,
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
+    )
 
 
 def test_forge_init_overrides(mock_dynamodb_forge, mock_s3_forge):
@@ -82,12 +96,27 @@ def test_forge_init_overrides(mock_dynamodb_forge, mock_s3_forge):
     forge_id = data_forge_config[0]["forge_id"]
     dynamodb = data_forge_config[0]["dynamodb"]
     mock_dynamodb_forge.assert_called_once_with(
-        forge_id=forge_id, config=dynamodb, session=None, overrides=[for_all, for_dynamodb]
+        forge_id=forge_id,
+        config=dynamodb,
+        session=None,
+        overrides=[for_all, for_dynamodb],
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
     )
 
     forge_id = data_forge_config[1]["forge_id"]
     s3 = data_forge_config[1]["s3"]
-    mock_s3_forge.assert_called_once_with(forge_id=forge_id, config=s3, session=None, overrides=[for_all, for_s3])
+    mock_s3_forge.assert_called_once_with(
+        forge_id=forge_id,
+        config=s3,
+        session=None,
+        overrides=[for_all, for_s3],
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
+        json_serializer=ANY,
+    )
 
 
 def test_forge_init_invalid_forge_type(mock_dynamodb_forge):
@@ -158,11 +187,45 @@ def test_load_data_from_file(mock_dynamodb_forge):
         },
         session=None,
         overrides=None,
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
     )
 
     mock_dynamodb_forge.return_value.load_data.assert_called_once_with()
 
 
+@pytest.mark.parametrize("serializer", [None, "json"])
+def test_load_data_from_file_serializer(tmp_path, mock_dynamodb_forge, serializer):
+    config_path = tmp_path / "forge_config.json"
+    config_path.write_text(
+        '[{"forge_id": "some_config_1", "dynamodb": {"table": {"name": "some_table"}, "primary_key_names": ["PK"], '
+        '"items": [{"data": {"PK": "some_key_1", "Count": 1180591620717411303425}}]}}]'
+    )
+
+    ForgeFactory(str(config_path), serializer=serializer and get_json_serializer(serializer))
+
+    config = mock_dynamodb_forge.call_args.kwargs["config"]
+    assert config["items"] == [{"data": {"PK": "some_key_1", "Count": 2**70 + 1}}]
+
+
+def test_s3_forge_json_serializer():
+    data_forge_config = [
+        {
+            "forge_id": "some_config",
+            "s3": {
+                "bucket": {"name": "some_bucket"},
+                "s3_objects": [{"key": "some_key", "data": {"json": {"some_key": ["some_value", 1]}}}],
+            },
+        }
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config, serializer=get_json_serializer("orjson"))
+    forge = forge_factory.data_managers["some_config"]
+
+    assert forge._get_encoded_payload(forge._s3_objects[0]) == b'{"some_key":["some_value",1]}'
+
+
 def test_cleanup_all_data(mock_dynamodb_forge, mock_s3_forge):
     data_forge_config = [
         {
@@ -213,6 +276,9 @@ def test_load_data_dynamodb(mock_dynamodb_forge, mock_s3_forge):
         },
         session=None,
         overrides=None,
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
     )
 
     forge_factory.load_data("some_config")
@@ -242,6 +308,10 @@ def test_load_data_s3(mock_dynamodb_forge, mock_s3_forge):
         },
         session=None,
         overrides=None,
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
+        json_serializer=ANY,
     )
 
     forge_factory.load_data("some_config")
@@ -366,7 +436,7 @@ def test_get_data(mock_dynamodb_forge):
 
     data = forge_factory.get_data("some_config")
 
-    mock_dynamodb_forge.return_value.get_data.assert_called_once_with(query=None, return_source=False)
+    mock_dynamodb_forge.return_value.get_data.assert_called_once_with(query=None, return_source=False, read_only=False)
 
     assert data == [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}]
 
@@ -394,7 +464,7 @@ def test_get_data_first_item(mock_dynamodb_forge):
 
     data = forge_factory.get_data_first_item("some_config")
 
-    mock_dynamodb_forge.return_value.get_data.assert_called_once_with(query=None, return_source=False)
+    mock_dynamodb_forge.return_value.get_data.assert_called_once_with(query=None, return_source=False, read_only=False)
 
     assert data == {"data": {"PK": "some_key_1", "Description": "Some description 1"}}
 
@@ -417,3 +487,393 @@ def test_get_data_invalid_id(mock_dynamodb_forge):
         forge_factory.get_data("invalid_config")
 
     assert str(e.value) == "invalid_config not initialized (some_config)."
+
+
+def test_load_all_data_concurrently(mock_dynamodb_forge, mock_s3_forge, caplog):
+    data_forge_config = [
+        {
+            "forge_id": "some_config_1",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        },
+        {
+            "forge_id": "some_config_2",
+            "s3": {
+                "bucket": {"name": "some_table"},
+                "s3_objects": [{"key": "some_key_1", "data": {"text": "Some Data"}}],
+            },
+        },
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config)
+
+    with caplog.at_level("INFO", logger="skymantle_mock_data_forge.forge_factory"):
+        forge_factory.load_data(max_workers=4)
+
+    mock_dynamodb_forge.return_value.load_data.assert_called_once_with()
+    mock_s3_forge.return_value.load_data.assert_called_once_with()
+
+    assert "load_data completed for 2 forge(s): some_config_1=" in caplog.text
+    assert "some_config_2=" in caplog.text
+
+
+def test_load_all_data_concurrently_resource_per_thread(mocker: MockerFixture):
+    resource_threads = {}
+
+    def get_dynamodb_resource(**kwargs):
+        resource = MagicMock()
+
+        def record_thread(**kwargs):
+            time.sleep(0.01)
+            resource_threads.setdefault(id(resource), set()).add(threading.get_ident())
+            return {"UnprocessedItems": {}}
+
+        resource.Table.return_value.put_item.side_effect = record_thread
+        resource.Table.return_value.delete_item.side_effect = record_thread
+        resource.batch_write_item.side_effect = record_thread
+
+        return resource
+
+    mock_resource = mocker.patch(
+        "skymantle_mock_data_forge.dynamodb_forge.dynamodb.get_dynamodb_resource", side_effect=get_dynamodb_resource
+    )
+
+    # Forges with more items than the batch threshold use BatchWriteItem, the others PutItem and DeleteItem.
+    data_forge_config = [
+        {
+            "forge_id": f"some_config_{forge}",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": f"some_key_{forge}_{index}"}} for index in range(forge * 20)],
+            },
+        }
+        for forge in range(1, 5)
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config)
+    forge_factory.load_data(max_workers=4)
+    forge_factory.cleanup_data(max_workers=4)
+
+    assert all(call.kwargs["enable_cache"] == EnableCache.NO for call in mock_resource.call_args_list)
+    assert len(resource_threads) == mock_resource.call_count
+    assert all(len(threads) == 1 for threads in resource_threads.values())
+
+
+def test_cleanup_all_data_concurrently_errors(mock_dynamodb_forge, mock_s3_forge):
+    data_forge_config = [
+        {
+            "forge_id": "some_config_1",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        },
+        {
+            "forge_id": "some_config_2",
+            "s3": {
+                "bucket": {"name": "some_table"},
+                "s3_objects": [{"key": "some_key_1", "data": {"text": "Some Data"}}],
+            },
+        },
+    ]
+
+    mock_dynamodb_forge.return_value.cleanup_data.side_effect = Exception("some error")
+
+    forge_factory = ForgeFactory(data_forge_config)
+
+    with pytest.raises(ExceptionGroup) as e:
+        forge_factory.cleanup_data(max_workers=4)
+
+    assert str(e.value) == "Unable to cleanup_data for forges: some_config_1 (1 sub-exception)"
+    assert [str(error) for error in e.value.exceptions] == ["some error"]
+    assert e.value.exceptions[0].__notes__ == ["forge_id: some_config_1"]
+
+    mock_s3_forge.return_value.cleanup_data.assert_called_once_with()
+
+
+def test_get_data_read_only(mock_dynamodb_forge):
+    data_forge_config = [
+        {
+            "forge_id": "some_config",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        }
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config)
+    forge_factory.get_data_first_item("some_config", read_only=True)
+
+    mock_dynamodb_forge.return_value.get_data.assert_called_once_with(query=None, return_source=False, read_only=True)
+
+
+def test_lazy_forges(mock_dynamodb_forge, mock_s3_forge):
+    data_forge_config = [
+        {
+            "forge_id": "some_config_1",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        },
+        {
+            "forge_id": "some_config_2",
+            "s3": {
+                "bucket": {"name": "some_table"},
+                "s3_objects": [{"key": "some_key_1", "data": {"text": "Some Data"}}],
+            },
+        },
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config, lazy_forges=True)
+
+    mock_dynamodb_forge.assert_not_called()
+    mock_s3_forge.assert_not_called()
+
+    forge_factory.get_data("some_config_1")
+    forge_factory.get_data("some_config_1")
+
+    mock_dynamodb_forge.assert_called_once_with(
+        forge_id="some_config_1",
+        config=data_forge_config[0]["dynamodb"],
+        session=None,
+        overrides=None,
+        key_path_error_policy=ANY,
+        manifest=None,
+        destination_resolver=ANY,
+    )
+    mock_s3_forge.assert_not_called()
+    assert list(forge_factory.data_managers) == ["some_config_1"]
+
+    forge_factory.load_data(max_workers=4)
+
+    mock_s3_forge.assert_called_once()
+    mock_dynamodb_forge.return_value.load_data.assert_called_once_with()
+    mock_s3_forge.return_value.load_data.assert_called_once_with()
+
+
+def test_lazy_forges_invalid_id(mock_dynamodb_forge):
+    data_forge_config = [
+        {
+            "forge_id": "some_config",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        }
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config, lazy_forges=True)
+
+    with pytest.raises(Exception) as e:
+        forge_factory.get_data("invalid_config")
+
+    assert str(e.value) == "invalid_config not initialized (some_config)."
+    mock_dynamodb_forge.assert_not_called()
+
+
+def test_lazy_forges_created_by_another_thread(mock_dynamodb_forge):
+    data_forge_config = [
+        {
+            "forge_id": "some_config",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        }
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config, lazy_forges=True)
+
+    class DataManagers(dict):
+        stale = True
+
+        def get(self, key, default=None):
+            if self.stale:
+                # Another thread creates the forge just after this thread finds it missing
+                self.stale = False
+                forge_factory._create_pending_forge(key)
+                return default
+
+            return super().get(key, default)
+
+    forge_factory.data_managers = DataManagers()
+
+    assert forge_factory._get_data_manager("some_config") is mock_dynamodb_forge.return_value
+    mock_dynamodb_forge.assert_called_once()
+
+
+def test_build_processes(mocker: MockerFixture):
+    data_forge_config = [
+        {
+            "forge_id": f"some_config_{index}",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"tags": {"test": "one"}, "data": {"PK": f"some_key_{index}", "Description": "Some {}"}}],
+            },
+        }
+        for index in range(3)
+    ]
+
+    overrides = [
+        {"key_paths": "data.Description", "override_type": OverrideType.FORMAT_VALUE, "override": ["description"]},
+        {"key_paths": "data.Missing", "override_type": OverrideType.REPLACE_VALUE, "override": "value"},
+    ]
+
+    spy = mocker.spy(ForgeFactory, "_create_forge_in_process")
+    forge_factory = ForgeFactory(data_forge_config, overrides=overrides, build_processes=2)
+
+    assert spy.call_count == 3
+    assert all(forge is not None for forge in spy.spy_return_list)
+    assert list(forge_factory.data_managers) == ["some_config_0", "some_config_1", "some_config_2"]
+    assert forge_factory.get_data(query={"StringEquals": {"test": "one"}}) == [
+        {"PK": "some_key_0", "Description": "Some description"},
+        {"PK": "some_key_1", "Description": "Some description"},
+        {"PK": "some_key_2", "Description": "Some description"},
+    ]
+    assert forge_factory.key_path_error_policy.summary() == {
+        "some_config_0": {"data.Missing": 1},
+        "some_config_1": {"data.Missing": 1},
+        "some_config_2": {"data.Missing": 1},
+    }
+
+
+def test_build_processes_unpicklable_overrides(mocker: MockerFixture):
+    data_forge_config = [
+        {
+            "forge_id": "some_config",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "some description"}}],
+            },
+        }
+    ]
+
+    overrides = [
+        {
+            "key_paths": "data.Description",
+            "override_type": OverrideType.CALL_FUNCTION,
+            "override": lambda key, value, context: value.upper(),
+        }
+    ]
+
+    spy = mocker.spy(ForgeFactory, "_create_forge_in_process")
+    forge_factory = ForgeFactory(data_forge_config, overrides=overrides, build_processes=2)
+
+    assert spy.spy_return is None
+    assert forge_factory.get_data("some_config") == [{"PK": "some_key_1", "Description": "SOME DESCRIPTION"}]
+
+
+def test_build_processes_broken_pool(mocker: MockerFixture, caplog):
+    mock_executor = mocker.patch("skymantle_mock_data_forge.forge_factory.ProcessPoolExecutor")
+    mock_executor.return_value.__enter__.return_value.submit.side_effect = BrokenProcessPool("some error")
+
+    data_forge_config = [
+        {
+            "forge_id": f"some_config_{index}",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": f"some_key_{index}"}}],
+            },
+        }
+        for index in range(2)
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config, build_processes=2)
+
+    assert forge_factory.get_data("some_config_0") == [{"PK": "some_key_0"}]
+    assert forge_factory.get_data("some_config_1") == [{"PK": "some_key_1"}]
+    assert "the process pool stopped: some error" in caplog.text
+
+
+def test_aload_and_acleanup_data(mock_dynamodb_forge, mock_s3_forge, caplog):
+    mock_dynamodb_forge.return_value.aload_data = AsyncMock()
+    mock_dynamodb_forge.return_value.acleanup_data = AsyncMock()
+    mock_s3_forge.return_value.aload_data = AsyncMock()
+    mock_s3_forge.return_value.acleanup_data = AsyncMock()
+    mock_s3_forge.return_value.aget_data = AsyncMock(return_value=[{"key": "some_key_1"}])
+
+    data_forge_config = [
+        {
+            "forge_id": "some_config_1",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        },
+        {
+            "forge_id": "some_config_2",
+            "s3": {
+                "bucket": {"name": "some_table"},
+                "s3_objects": [{"key": "some_key_1", "data": {"text": "Some Data"}}],
+            },
+        },
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config, lazy_forges=True)
+
+    with caplog.at_level("INFO", logger="skymantle_mock_data_forge.forge_factory"):
+        asyncio.run(forge_factory.aload_data(max_concurrency=2))
+
+    mock_dynamodb_forge.return_value.aload_data.assert_awaited_once_with(max_concurrency=2)
+    mock_s3_forge.return_value.aload_data.assert_awaited_once_with(max_concurrency=2)
+    assert "aload_data completed for 2 forge(s): some_config_1=" in caplog.text
+
+    assert asyncio.run(forge_factory.aget_data("some_config_2")) == [{"key": "some_key_1"}]
+    mock_s3_forge.return_value.aget_data.assert_awaited_once_with(query=None, return_source=False, read_only=False)
+
+    asyncio.run(forge_factory.acleanup_data("some_config_1"))
+
+    mock_dynamodb_forge.return_value.acleanup_data.assert_awaited_once_with(max_concurrency=8)
+    mock_s3_forge.return_value.acleanup_data.assert_not_awaited()
+
+
+def test_aload_data_errors(mock_dynamodb_forge, mock_s3_forge):
+    mock_dynamodb_forge.return_value.aload_data = AsyncMock(side_effect=Exception("Some error"))
+    mock_s3_forge.return_value.aload_data = AsyncMock()
+
+    data_forge_config = [
+        {
+            "forge_id": "some_config_1",
+            "dynamodb": {
+                "table": {"name": "some_table"},
+                "primary_key_names": ["PK"],
+                "items": [{"data": {"PK": "some_key_1", "Description": "Some description 1"}}],
+            },
+        },
+        {
+            "forge_id": "some_config_2",
+            "s3": {
+                "bucket": {"name": "some_table"},
+                "s3_objects": [{"key": "some_key_1", "data": {"text": "Some Data"}}],
+            },
+        },
+    ]
+
+    forge_factory = ForgeFactory(data_forge_config)
+
+    with pytest.raises(ExceptionGroup) as e:
+        asyncio.run(forge_factory.aload_data())
+
+    assert str(e.value) == "Unable to aload_data for forges: some_config_1 (1 sub-exception)"
+    assert e.value.exceptions[0].__notes__ == ["forge_id: some_config_1"]
+    mock_s3_forge.return_value.aload_data.assert_awaited_once()
+
+    with pytest.raises(Exception) as e:
+        asyncio.run(forge_factory.aload_data("invalid_config"))
+
+    assert str(e.value) == "invalid_config not initialized (some_config_1,some_config_2)."
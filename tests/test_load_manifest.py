@@ -0,0 +1,39 @@
+import json
+
+from skymantle_mock_data_forge.load_manifest import LoadManifest
+
+
+def test_set_and_get_hashes(tmp_path):
+    path = tmp_path / "manifest.json"
+
+    manifest = LoadManifest(str(path))
+    assert manifest.get_hashes("some_config", "some_table") == {}
+
+    manifest.set_hashes("some_config", "some_table", {"some_key": "some_hash"})
+
+    assert json.loads(path.read_text()) == {
+        "some_config": {"destination": "some_table", "hashes": {"some_key": "some_hash"}}
+    }
+
+    manifest = LoadManifest(str(path))
+    assert manifest.get_hashes("some_config", "some_table") == {"some_key": "some_hash"}
+    assert manifest.get_hashes("some_config", "other_table") == {}
+
+
+def test_remove_and_clear(tmp_path):
+    path = tmp_path / "manifest" / "manifest.json"
+
+    manifest = LoadManifest(str(path))
+    manifest.set_hashes("some_config_1", "some_table", {"some_key": "some_hash"})
+    manifest.set_hashes("some_config_2", "some_bucket", {"some_key": "some_hash"})
+
+    manifest.remove("some_config_1")
+    assert list(json.loads(path.read_text())) == ["some_config_2"]
+
+    manifest.clear()
+    assert json.loads(path.read_text()) == {}
+
+
+def test_hash_content():
+    assert LoadManifest.hash_content("some_value") == LoadManifest.hash_content(b"some_value")
+    assert LoadManifest.hash_content("some_value") != LoadManifest.hash_content("other_value")
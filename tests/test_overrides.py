@@ -6,7 +6,9 @@ import pytest
 from pytest_mock import MockerFixture
 
 from skymantle_mock_data_forge.base_forge import BaseForge
-from skymantle_mock_data_forge.models import OverrideType
+from skymantle_mock_data_forge.key_path_policy import KeyPathErrorPolicy
+from skymantle_mock_data_forge.models import OverrideContext, OverrideType
+from skymantle_mock_data_forge.views import ReadOnlyDict
 
 
 @pytest.fixture(autouse=True)
@@ -379,3 +381,145 @@ def test_invalid_override_type():
         forge._override_data(data)
 
     assert str(e.value) == "Unsupported override type - bad_override_type"
+
+
+def test_multi_level_nested_lists():
+    data = [
+        {"groups": [{"items": [{"id": ""}, {"id": ""}]}, {"items": [{"id": ""}]}]},
+        {"groups": []},
+    ]
+
+    ids = iter(["a", "b", "c"])
+    overrides = [
+        {
+            "key_paths": "groups.items.id",
+            "override_type": OverrideType.CALL_FUNCTION,
+            "override": lambda key, value, context: next(ids),
+        },
+    ]
+
+    forge = BaseForge("string", overrides)
+    update_data = forge._override_data(data)
+
+    assert update_data == [
+        {"groups": [{"items": [{"id": "a"}, {"id": "b"}]}, {"items": [{"id": "c"}]}]},
+        {"groups": []},
+    ]
+
+
+def test_nested_lists_call_function_context():
+    contexts = []
+
+    def record_context(key: str, value: any, context: dict) -> any:
+        contexts.append(context)
+        return value
+
+    data = [{"id": "parent", "items": [{"id": "child_1"}, {"id": "child_2"}]}]
+
+    overrides = [
+        {
+            "key_paths": ["id", "items.id"],
+            "override_type": OverrideType.CALL_FUNCTION,
+            "override": record_context,
+        },
+    ]
+
+    forge = BaseForge("string", overrides)
+    forge._override_data(data)
+
+    assert contexts == [data[0], {"id": "child_1"}, {"id": "child_2"}]
+
+
+def test_nested_lists_invalid_suppress():
+    data = [{"items": [{"id": ""}, "id", {"id": ""}]}]
+
+    overrides = [
+        {
+            "key_paths": "items.id",
+            "override_type": OverrideType.REPLACE_VALUE,
+            "override": "some_id",
+        },
+    ]
+
+    forge = BaseForge("string", overrides)
+    update_data = forge._override_data(data)
+
+    assert update_data == [{"items": [{"id": "some_id"}, "id", {"id": ""}]}]
+
+
+def test_call_function_read_only_context():
+    contexts = []
+
+    def generate_id(key: str, value: any, context: dict) -> any:
+        contexts.append(context)
+
+        with pytest.raises(TypeError):
+            context["id"] = "changed"
+
+        return f"{value}_{context['name']}"
+
+    data = [{"id": "old1", "name": "one"}, {"id": "old2", "name": "two"}]
+
+    overrides = [
+        {
+            "key_paths": "id",
+            "override_type": OverrideType.CALL_FUNCTION,
+            "override": generate_id,
+            "context": OverrideContext.READ_ONLY,
+        }
+    ]
+
+    forge = BaseForge("string", overrides)
+    update_data = forge._override_data(data)
+
+    assert update_data == [{"id": "old1_one", "name": "one"}, {"id": "old2_two", "name": "two"}]
+    assert all(isinstance(context, ReadOnlyDict) for context in contexts)
+
+
+def test_key_path_error_policy_summary():
+    data = [{"id": "", "items": [{"id": ""}, "id"]}, {"id": ""}]
+
+    overrides = [
+        {
+            "key_paths": ["id", "items.id", "name"],
+            "override_type": OverrideType.REPLACE_VALUE,
+            "override": "some_id",
+        },
+    ]
+
+    policy = KeyPathErrorPolicy(suppress=True)
+    forge = BaseForge("string", overrides, key_path_error_policy=policy)
+    update_data = forge._override_data(data)
+
+    assert update_data == [{"id": "some_id", "items": [{"id": "some_id"}, "id"]}, {"id": "some_id"}]
+    assert forge.key_path_error_policy is policy
+    assert policy.summary() == {"string": {"items.id": 2, "name": 2}}
+
+
+def test_key_path_error_policy_overrides_environment():
+    os.environ["DATA_FORGE_SUPPRESS_KEY_PATH_ERRORS"] = "true"
+
+    data = [{"create_date": ""}]
+
+    overrides = [
+        {
+            "key_paths": "id",
+            "override_type": OverrideType.REPLACE_VALUE,
+            "override": "a string",
+        },
+    ]
+
+    forge = BaseForge("string", overrides, key_path_error_policy=KeyPathErrorPolicy(suppress=False))
+
+    with pytest.raises(Exception) as e:
+        forge._override_data(data)
+
+    assert str(e.value) == "The key:id does not exist."
+
+
+def test_key_path_error_policy_from_environment():
+    os.environ["DATA_FORGE_SUPPRESS_KEY_PATH_ERRORS"] = "off"
+    assert not KeyPathErrorPolicy.from_environment().suppress
+
+    os.environ["DATA_FORGE_SUPPRESS_KEY_PATH_ERRORS"] = "yes"
+    assert KeyPathErrorPolicy.from_environment().suppress
@@ -0,0 +1,76 @@
+import pytest
+
+from skymantle_mock_data_forge.dynamodb_forge import DynamoDbForge
+from skymantle_mock_data_forge.query_plan import QueryPlan
+
+OPERATORS = ["StringEquals", "StringLike"]
+
+
+def test_compile():
+    plan = QueryPlan.compile(
+        {"StringEquals": {"tests": "test_1", "type": "a"}, "StringLike": {"tests": "test"}}, OPERATORS
+    )
+
+    assert plan.conditions == (
+        ("StringEquals", "tests", "test_1"),
+        ("StringEquals", "type", "a"),
+        ("StringLike", "tests", "test"),
+    )
+
+
+def test_key_normalized():
+    plan_1 = QueryPlan.compile({"StringEquals": {"tests": "test_1", "type": "a"}}, OPERATORS)
+    plan_2 = QueryPlan.compile({"StringEquals": {"type": "a", "tests": "test_1"}}, OPERATORS)
+    plan_3 = QueryPlan.compile({"StringEquals": {"type": "b", "tests": "test_1"}}, OPERATORS)
+
+    assert plan_1.key == plan_2.key
+    assert plan_1.key != plan_3.key
+
+
+def test_key_unhashable():
+    plan = QueryPlan.compile({"StringEquals": {"tests": ["test_1"]}}, OPERATORS)
+
+    assert plan.key is None
+
+
+@pytest.mark.parametrize(
+    ("query", "message"),
+    [
+        ({}, "Missing operator from query"),
+        ({"Invalid": {}}, "Only the following query operators are supported: ['StringEquals', 'StringLike']"),
+        ({"StringEquals": "invalid"}, "The condition for an operator must be a dict."),
+    ],
+)
+def test_compile_invalid(query, message):
+    with pytest.raises(Exception) as e:
+        QueryPlan.compile(query, OPERATORS)
+
+    assert str(e.value) == message
+
+
+def test_get_data_compiled_query_memoized(mocker):
+    data_loader_config = {
+        "table": {"name": "some_table"},
+        "primary_key_names": ["PK"],
+        "items": [
+            {"tags": {"tests": "test_1"}, "data": {"PK": "some_key_1"}},
+            {"tags": {"tests": "test_2"}, "data": {"PK": "some_key_2"}},
+        ],
+    }
+
+    manager = DynamoDbForge("some-config", data_loader_config)
+    spy = mocker.spy(manager, "_run_query_plan")
+
+    plan = manager.compile_query({"StringEquals": {"tests": "test_2"}})
+
+    assert manager.get_data(query=plan, return_source=False) == [{"PK": "some_key_2"}]
+    assert manager.get_data(query={"StringEquals": {"tests": "test_2"}}, return_source=False) == [{"PK": "some_key_2"}]
+    assert spy.call_count == 1
+
+    # Adding items invalidates the memoized results
+    item = {"tags": {"tests": "test_2"}, "data": {"PK": "some_key_3"}}
+    manager._items.append(item)
+    manager._index_items([item])
+
+    assert manager.get_data(query=plan, return_source=False) == [{"PK": "some_key_2"}, {"PK": "some_key_3"}]
+    assert spy.call_count == 2
@@ -1,13 +1,20 @@
+import asyncio
+import hashlib
 import json
 import os
+import pickle
 
 import boto3
 import pytest
+from botocore.exceptions import ClientError
 from moto import mock_aws
 from pytest_mock import MockerFixture
 
+from skymantle_mock_data_forge import destination_resolver
+from skymantle_mock_data_forge.load_manifest import LoadManifest
 from skymantle_mock_data_forge.models import OverrideType
-from skymantle_mock_data_forge.s3_forge import S3Forge
+from skymantle_mock_data_forge.s3_forge import LazyPayload, S3Forge
+from skymantle_mock_data_forge.serializers import get_json_serializer
 
 
 @pytest.fixture(autouse=True)
@@ -641,6 +648,27 @@ def test_get_data_query_invalid_tag_list():
     assert str(e.value) == "Tag values can only be strings or list of strings."
 
 
+def test_get_data_query_invalid_tag_excluded():
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [
+            {"key": "some_key_1", "tags": {"tests": "test_1", "type": 0}, "data": {"text": "Some Data"}},
+            {"key": "some_key_2", "tags": {"tests": "test_2", "type": "text"}, "data": {"text": "Some Data"}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+
+    # The item with the invalid tag is excluded by the first condition, so it isn't reported.
+    data = manager.get_data(query={"StringEquals": {"tests": "test_2", "type": "text"}}, return_source=False)
+    assert data == [{"key": "some_key_2", "data": {"text": "Some Data"}}]
+
+    with pytest.raises(Exception) as e:
+        manager.get_data(query={"StringEquals": {"type": "text", "tests": "test_2"}}, return_source=False)
+
+    assert str(e.value) == "Tag values can only be strings or list of strings."
+
+
 @mock_aws
 def test_add_key_and_cleanup_data():
     s3_client = boto3.client("s3")
@@ -695,3 +723,494 @@ def test_override():
 
     data = manager.get_data(query=None, return_source=True)
     assert data == [{"key": "some_key", "data": {"json": {"some_key": "some_other_value"}}}]
+
+
+@mock_aws
+def test_load_data_resolves_bucket_name_once(mocker: MockerFixture):
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_ssm_key", Type="String", Value="some_bucket")
+
+    spy = mocker.spy(destination_resolver.ssm, "get_parameter")
+
+    s3_config = {
+        "bucket": {"ssm": "some_ssm_key"},
+        "s3_objects": [{"key": f"some_key_{i}", "data": {"text": "Some Data"}} for i in range(3)],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+    manager.load_data()
+    manager.cleanup_data()
+
+    assert spy.call_count == 1
+
+
+@mock_aws
+def test_load_data_concurrently():
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": f"some_key_{i}", "data": {"json": {"index": i}}} for i in range(20)],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+    manager.load_data(max_workers=4)
+
+    for i in range(20):
+        response = s3_client.get_object(Bucket="some_bucket", Key=f"some_key_{i}")
+        assert response["Body"].read() == json.dumps({"index": i}).encode()
+
+
+def test_load_data_retries_object(mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.s3_forge.time.sleep")
+    mock_get_s3_client = mocker.patch("skymantle_mock_data_forge.s3_forge.s3.get_s3_client")
+
+    error = ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."}}, "PutObject")
+    mock_get_s3_client.return_value.put_object.side_effect = [error, {}]
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_key", "data": {"text": "Some Data"}}],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+    manager.load_data(max_workers=2)
+
+    assert mock_get_s3_client.return_value.put_object.call_count == 2
+
+
+def test_load_data_concurrently_errors(mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.s3_forge.time.sleep")
+    mock_get_s3_client = mocker.patch("skymantle_mock_data_forge.s3_forge.s3.get_s3_client")
+
+    error = ClientError({"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "PutObject")
+    mock_get_s3_client.return_value.put_object.side_effect = error
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [
+            {"key": "some_key_1", "data": {"text": "Some Data"}},
+            {"key": "some_key_2", "data": {"text": "Some Data"}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+
+    with pytest.raises(ExceptionGroup) as e:
+        manager.load_data(max_workers=2)
+
+    assert str(e.value) == "Unable to upload 2 objects to bucket: some_bucket (2 sub-exceptions)"
+    assert mock_get_s3_client.return_value.put_object.call_count == 8
+
+
+@mock_aws
+def test_load_large_file_multipart(tmp_path):
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    filename = tmp_path / "large_file.bin"
+    filename.write_bytes(os.urandom(2 * 1024 * 1024))
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [
+            {"key": "some_large_key", "data": {"file": str(filename)}},
+            {"key": "some_small_key", "data": {"file": "tests/data/amazon_web_services_logo.png"}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config, multipart_threshold=1024 * 1024)
+    manager.load_data()
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_large_key")
+    assert response["Body"].read() == filename.read_bytes()
+    assert response["ETag"].endswith('-1"')
+
+    with open("tests/data/amazon_web_services_logo.png", "rb") as file:
+        data = file.read()
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_small_key")
+    assert response["Body"].read() == data
+    assert "-" not in response["ETag"]
+
+
+@mock_aws
+def test_lazy_payloads():
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    payload = {"json": {"some_key": "some_value"}}
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_key", "tags": {"type": "json"}, "data": payload}],
+    }
+
+    manager = S3Forge("some-config", s3_config, lazy_payloads=True)
+    assert manager._s3_objects[0]["data"].resolve() is payload
+
+    manager.load_data()
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_key")
+    assert response["Body"].read() == b'{"some_key": "some_value"}'
+
+    data = manager.get_data(query={"StringEquals": {"type": "json"}}, return_source=True)
+    assert data == [{"key": "some_key", "tags": {"type": "json"}, "data": {"json": {"some_key": "some_value"}}}]
+
+    data[0]["data"]["json"]["some_key"] = "changed"
+    assert payload == {"json": {"some_key": "some_value"}}
+
+
+@mock_aws
+def test_lazy_payloads_override():
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_key", "data": {"json": {"some_key": "some_value"}}}],
+    }
+
+    overrides = [
+        {
+            "key_paths": ["key", "data.json.some_key"],
+            "override_type": OverrideType.REPLACE_VALUE,
+            "override": "some_other_value",
+        },
+    ]
+
+    manager = S3Forge("some-config", s3_config, overrides=overrides, lazy_payloads=True)
+    manager.load_data()
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_other_value")
+    assert response["Body"].read() == b'{"some_key": "some_other_value"}'
+
+    data = manager.get_data(query=None, return_source=False)
+    assert data == [{"key": "some_other_value", "data": {"json": {"some_key": "some_other_value"}}}]
+    assert s3_config["s3_objects"][0]["data"] == {"json": {"some_key": "some_value"}}
+
+
+def test_lazy_payloads_call_function_resolved_once():
+    calls = []
+
+    def generate_value(key, value, context):
+        calls.append(value)
+        return f"generated_{len(calls)}"
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_key", "data": {"text": "Some Data"}}],
+    }
+
+    overrides = [
+        {
+            "key_paths": "data.text",
+            "override_type": OverrideType.CALL_FUNCTION,
+            "override": generate_value,
+        },
+    ]
+
+    manager = S3Forge("some-config", s3_config, overrides=overrides, lazy_payloads=True)
+
+    assert manager.get_data(query=None, return_source=False) == [{"key": "some_key", "data": {"text": "generated_1"}}]
+    assert manager.get_data(query=None, return_source=False) == [{"key": "some_key", "data": {"text": "generated_1"}}]
+    assert calls == ["Some Data"]
+
+
+def test_lazy_payloads_call_function_object_context():
+    def get_key(key, value, context):
+        return f"{value}_{context['data']['text']}"
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_key", "data": {"text": "Some Data"}}],
+    }
+
+    overrides = [{"key_paths": "key", "override_type": OverrideType.CALL_FUNCTION, "override": get_key}]
+
+    manager = S3Forge("some-config", s3_config, overrides=overrides, lazy_payloads=True)
+
+    assert manager.get_data(query=None, return_source=False) == [
+        {"key": "some_key_Some Data", "data": {"text": "Some Data"}}
+    ]
+
+
+def test_lazy_payloads_pickle():
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_key", "data": {"json": {"some_key": "some_value"}}}],
+    }
+
+    overrides = [
+        {"key_paths": "data.json.some_key", "override_type": OverrideType.REPLACE_VALUE, "override": "some_other_value"}
+    ]
+
+    manager = S3Forge("some-config", s3_config, overrides=overrides, lazy_payloads=True)
+    manager = pickle.loads(pickle.dumps(manager))  # noqa: S301
+
+    assert isinstance(manager._s3_objects[0]["data"], LazyPayload)
+    assert manager.get_data(query=None, return_source=False) == [
+        {"key": "some_key", "data": {"json": {"some_key": "some_other_value"}}}
+    ]
+
+
+def test_get_data_read_only():
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [
+            {"key": "some_key_1", "tags": {"type": "text"}, "data": {"text": "Some Data"}},
+            {"key": "some_key_2", "tags": {"type": "json"}, "data": {"json": {"some_key": "some_value"}}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+    data = manager.get_data(query={"StringEquals": {"type": "json"}}, return_source=False, read_only=True)
+
+    assert data == [{"key": "some_key_2", "data": {"json": {"some_key": "some_value"}}}]
+
+    with pytest.raises(TypeError):
+        data[0]["data"]["json"]["some_key"] = "some_other_value"
+
+
+@mock_aws
+def test_aload_and_acleanup_data():
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": f"some_key_{i}", "data": {"json": {"index": i}}} for i in range(20)],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+    asyncio.run(manager.aload_data(max_concurrency=4))
+
+    for i in range(20):
+        response = s3_client.get_object(Bucket="some_bucket", Key=f"some_key_{i}")
+        assert response["Body"].read() == json.dumps({"index": i}).encode()
+
+    data = asyncio.run(manager.aget_data(query=None, return_source=False))
+    assert data[0] == {"key": "some_key_0", "data": {"json": {"index": 0}}}
+
+    asyncio.run(manager.acleanup_data(max_concurrency=4))
+
+    assert s3_client.list_objects_v2(Bucket="some_bucket")["KeyCount"] == 0
+
+
+def test_aload_data_errors(mocker: MockerFixture):
+    mocker.patch("skymantle_mock_data_forge.s3_forge.time.sleep")
+    mock_get_s3_client = mocker.patch("skymantle_mock_data_forge.s3_forge.s3.get_s3_client")
+
+    error = ClientError({"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "PutObject")
+    mock_get_s3_client.return_value.put_object.side_effect = error
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [
+            {"key": "some_key_1", "data": {"text": "Some Data"}},
+            {"key": "some_key_2", "data": {"text": "Some Data"}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+
+    with pytest.raises(ExceptionGroup) as e:
+        asyncio.run(manager.aload_data())
+
+    assert str(e.value) == "Unable to upload 2 objects to bucket: some_bucket (2 sub-exceptions)"
+
+
+@mock_aws
+def test_load_data_manifest(tmp_path, mocker: MockerFixture):
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    filename = tmp_path / "some_file.txt"
+    filename.write_text("Some file data")
+
+    manifest = LoadManifest(str(tmp_path / "manifest.json"))
+    s3_objects = [
+        {"key": "some_key_1", "data": {"text": "Some Data"}},
+        {"key": "some_key_2", "data": {"json": {"some_key": "some_value"}}},
+        {"key": "some_key_3", "data": {"file": str(filename)}},
+    ]
+
+    manager = S3Forge("some-config", {"bucket": {"name": "some_bucket"}, "s3_objects": s3_objects}, manifest=manifest)
+    manager.load_data()
+
+    assert s3_client.list_objects_v2(Bucket="some_bucket")["KeyCount"] == 3
+
+    # Change the json object and remove the text object
+    s3_objects = [
+        {"key": "some_key_2", "data": {"json": {"some_key": "other_value"}}},
+        {"key": "some_key_3", "data": {"file": str(filename)}},
+    ]
+    manager = S3Forge("some-config", {"bucket": {"name": "some_bucket"}, "s3_objects": s3_objects}, manifest=manifest)
+
+    spy = mocker.spy(manager, "_put_object")
+    manager.load_data(max_workers=2)
+
+    assert [call.args[2]["key"] for call in spy.call_args_list] == ["some_key_2"]
+
+    response = s3_client.list_objects_v2(Bucket="some_bucket")
+    assert [item["Key"] for item in response["Contents"]] == ["some_key_2", "some_key_3"]
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_key_2")
+    assert response["Body"].read() == b'{"some_key": "other_value"}'
+
+    asyncio.run(manager.acleanup_data())
+
+    assert manifest.get_hashes("some-config", "some_bucket") == {}
+
+
+@mock_aws
+def test_load_data_skip_unchanged(tmp_path, mocker: MockerFixture):
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    large_filename = tmp_path / "large_file.bin"
+    large_filename.write_bytes(os.urandom(2 * 1024 * 1024 + 10))
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "skip_unchanged": True,
+        "s3_objects": [
+            {"key": "fixtures/some_text", "data": {"text": "Some Data"}},
+            {"key": "fixtures/some_json", "data": {"json": {"some_key": "some_value"}}},
+            {"key": "fixtures/some_csv", "data": {"csv": [["a", 1], ["b", 2]]}},
+            {"key": "fixtures/some_base64", "data": {"base64": "U29tZSBEYXRh"}},
+            {"key": "fixtures/some_file", "data": {"file": "tests/data/amazon_web_services_logo.png"}},
+            {"key": "fixtures/some_large_file", "data": {"file": str(large_filename)}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config, multipart_threshold=1024 * 1024)
+    manager.load_data()
+
+    response = s3_client.head_object(Bucket="some_bucket", Key="fixtures/some_large_file")
+    assert response["ETag"].endswith('-1"')
+
+    spy = mocker.spy(manager, "_put_object")
+    manager.load_data()
+
+    assert spy.call_count == 0
+
+    s3_client.put_object(Bucket="some_bucket", Key="fixtures/some_json", Body=b"changed")
+    s3_client.delete_object(Bucket="some_bucket", Key="fixtures/some_text")
+
+    asyncio.run(manager.aload_data())
+
+    assert sorted(call.args[2]["key"] for call in spy.call_args_list) == ["fixtures/some_json", "fixtures/some_text"]
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="fixtures/some_json")
+    assert response["Body"].read() == b'{"some_key": "some_value"}'
+
+    manager.load_data(skip_unchanged=False)
+
+    assert spy.call_count == 8
+
+
+def test_get_file_etag_multipart(tmp_path):
+    chunksize = 5 * 1024 * 1024
+    data = os.urandom(2 * chunksize + 10)
+
+    filename = tmp_path / "large_file.bin"
+    filename.write_bytes(data)
+
+    manager = S3Forge("some-config", {"bucket": {"name": "some_bucket"}, "s3_objects": []}, multipart_threshold=10)
+    manager._multipart_chunksize = chunksize
+
+    part_digests = b"".join(
+        hashlib.md5(data[start : start + chunksize], usedforsecurity=False).digest()
+        for start in range(0, len(data), chunksize)
+    )
+    assert manager._get_file_etag(str(filename)) == f"{hashlib.md5(part_digests, usedforsecurity=False).hexdigest()}-3"
+
+
+@mock_aws
+def test_load_data_caches_encoded_payloads(tmp_path, mocker: MockerFixture):
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    filename = tmp_path / "some_file.txt"
+    filename.write_text("Some file data")
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [
+            {"key": "some_json", "data": {"json": {"some_key": "some_value"}}},
+            {"key": "some_csv", "data": {"csv": [["a", 1], ["b", 2]]}},
+            {"key": "some_file", "data": {"file": str(filename)}},
+        ],
+    }
+
+    manager = S3Forge("some-config", s3_config)
+    mock_dumps = mocker.spy(manager._json_serializer, "dumps")
+
+    manager.load_data()
+    manager.cleanup_data()
+    manager.load_data()
+
+    assert mock_dumps.call_count == 1
+    assert list(manager._encoded_payloads.values()) == [b'{"some_key": "some_value"}', b"a,1\r\nb,2\r\n"]
+
+    filename.write_text("Changed file data")
+    manager.load_data()
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_file")
+    assert response["Body"].read() == b"Changed file data"
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_csv")
+    assert response["Body"].read() == b"a,1\r\nb,2\r\n"
+
+
+def test_cache_payloads_disabled(mocker: MockerFixture):
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_json", "data": {"json": {"some_key": "some_value"}}}],
+    }
+
+    manager = S3Forge("some-config", s3_config, cache_payloads=False)
+    mock_dumps = mocker.spy(manager._json_serializer, "dumps")
+
+    s3_object = manager._s3_objects[0]
+    assert manager._get_encoded_payload(s3_object) == b'{"some_key": "some_value"}'
+    assert manager._get_encoded_payload(s3_object) == b'{"some_key": "some_value"}'
+    assert mock_dumps.call_count == 2
+
+
+def test_cache_payloads_lazy_payloads(mocker: MockerFixture):
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_json", "data": {"json": {"some_key": "some_value"}}}],
+    }
+
+    manager = S3Forge("some-config", s3_config, lazy_payloads=True)
+    mock_dumps = mocker.spy(manager._json_serializer, "dumps")
+
+    s3_object = manager._s3_objects[0]
+    assert manager._get_encoded_payload(s3_object) == b'{"some_key": "some_value"}'
+    assert manager._get_encoded_payload(s3_object) == b'{"some_key": "some_value"}'
+    assert mock_dumps.call_count == 2
+    assert manager._encoded_payloads == {}
+
+
+@mock_aws
+def test_load_data_json_serializer():
+    session = boto3.Session()
+    s3_client = session.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    s3_config = {
+        "bucket": {"name": "some_bucket"},
+        "s3_objects": [{"key": "some_json", "data": {"json": {"some_key": ["some_value", 1]}}}],
+    }
+
+    manager = S3Forge("some-config", s3_config, json_serializer=get_json_serializer("orjson"))
+    manager.load_data()
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_json")
+    assert response["Body"].read() == b'{"some_key":["some_value",1]}'
@@ -0,0 +1,85 @@
+import json
+import math
+
+import pytest
+from pytest_mock import MockerFixture
+
+from skymantle_mock_data_forge import serializers
+from skymantle_mock_data_forge.serializers import (
+    AutoJsonSerializer,
+    JsonSerializer,
+    OrjsonSerializer,
+    default_serializer,
+    get_json_serializer,
+)
+
+
+def test_get_json_serializer():
+    assert isinstance(default_serializer, AutoJsonSerializer)
+    assert isinstance(get_json_serializer(), AutoJsonSerializer)
+    assert isinstance(get_json_serializer("orjson"), OrjsonSerializer)
+    assert type(get_json_serializer("json")) is JsonSerializer
+
+
+def test_get_json_serializer_not_supported():
+    with pytest.raises(Exception) as e:
+        get_json_serializer("ujson")
+
+    assert str(e.value) == "Only the following JSON serializers are supported: ['auto', 'json', 'orjson']"
+
+
+@pytest.mark.parametrize("name", ["auto", "json", "orjson"])
+def test_loads(name):
+    serializer = get_json_serializer(name)
+
+    assert serializer.loads('{"some_key": ["some_value", 1, 1.5, null]}') == {"some_key": ["some_value", 1, 1.5, None]}
+    assert serializer.loads(b'{"some_key": "some_value"}') == {"some_key": "some_value"}
+
+    with pytest.raises(ValueError):
+        serializer.loads("{")
+
+
+def test_dumps():
+    value = {"some_key": ["some_value", 1]}
+
+    assert get_json_serializer("auto").dumps(value) == json.dumps(value).encode()
+    assert get_json_serializer("json").dumps(value) == b'{"some_key": ["some_value", 1]}'
+    assert get_json_serializer("orjson").dumps(value) == b'{"some_key":["some_value",1]}'
+
+
+def test_auto_loads_falls_back_to_json():
+    serializer = get_json_serializer("auto")
+
+    value = serializer.loads('{"some_key": NaN}')
+    assert list(value.keys()) == ["some_key"]
+    assert math.isnan(value["some_key"])
+
+    with pytest.raises(ValueError):
+        get_json_serializer("orjson").loads('{"some_key": NaN}')
+
+
+@pytest.mark.parametrize(
+    ("data", "expected"),
+    [
+        ('{"some_key": 1180591620717411303425}', 2**70 + 1),
+        (b'{"some_key": 1180591620717411303425}', 2**70 + 1),
+        ('{"some_key": -9223372036854775809}', -(2**63) - 1),
+        ('{"some_key": "1234567890123456789"}', "1234567890123456789"),
+    ],
+)
+def test_auto_loads_large_integers(data, expected):
+    value = get_json_serializer("auto").loads(data)
+
+    assert value == {"some_key": expected}
+    assert type(value["some_key"]) is type(expected)
+
+
+def test_orjson_not_installed(mocker: MockerFixture):
+    mocker.patch.object(serializers, "orjson", None)
+
+    with pytest.raises(Exception) as e:
+        get_json_serializer("orjson")
+
+    assert str(e.value) == "orjson is required for the orjson serializer, install skymantle_mock_data_forge[orjson]"
+
+    assert get_json_serializer("auto").loads('{"some_key": "some_value"}') == {"some_key": "some_value"}
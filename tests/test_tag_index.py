@@ -0,0 +1,68 @@
+import pytest
+
+from skymantle_mock_data_forge.tag_index import TagIndex
+
+
+def test_add_and_get_positions():
+    index = TagIndex()
+
+    assert index.add({"tags": {"type": "text", "tests": ["test_1", "test_2"]}}) == 0
+    assert index.add({"tags": {"type": "json", "tests": "test_2"}}) == 1
+    assert index.add({"data": {}}) == 2
+
+    assert index.size == 3
+    assert index.get_positions("type", "text") == {0}
+    assert index.get_positions("tests", "test_2") == {0, 1}
+    assert index.get_positions("tests", "test_3") == set()
+    assert index.get_positions("missing", "test_1") == set()
+    assert index.get_values("type") == {"text": {0}, "json": {1}}
+
+
+def test_add_incrementally():
+    index = TagIndex()
+    index.add({"tags": {"type": "text"}})
+
+    assert index.get_positions("type", "text") == {0}
+
+    index.add({"tags": {"type": "text"}})
+
+    assert index.get_positions("type", "text") == {0, 1}
+
+
+@pytest.mark.parametrize("value", [0, [0], ["text", None]])
+def test_invalid_tag_value(value):
+    index = TagIndex()
+    index.add({"tags": {"type": value, "tests": "test_1"}})
+
+    index.add({"tags": {"type": "text"}})
+
+    assert index.get_positions("tests", "test_1") == {0}
+    assert index.get_positions("type", "text") == {1}
+    assert index.get_invalid_positions("type") == {0}
+    assert index.get_invalid_positions("tests") == set()
+
+
+def test_get_positions_like():
+    index = TagIndex()
+    index.add({"tags": {"tests": ["test_get_items", "test_update_item"]}})
+    index.add({"tags": {"tests": "test_get_item"}})
+    index.add({"tags": {"tests": "item_delete"}})
+
+    assert index.get_positions_like("tests", "get_item") == {0, 1}
+    assert index.get_positions_like("tests", "update") == {0}
+    assert index.get_positions_like("tests", "item") == {0, 1, 2}
+    assert index.get_positions_like("tests", "missing") == set()
+    assert index.get_positions_like("tests", "_d") == {2}
+    assert index.get_positions_like("tests", "") == {0, 1, 2}
+    assert index.get_positions_like("missing", "test") == set()
+
+
+def test_get_positions_like_added_incrementally():
+    index = TagIndex()
+    index.add({"tags": {"tests": "test_get_item"}})
+
+    assert index.get_positions_like("tests", "delete") == set()
+
+    index.add({"tags": {"tests": "item_delete"}})
+
+    assert index.get_positions_like("tests", "delete") == {1}
@@ -0,0 +1,63 @@
+import pytest
+
+from skymantle_mock_data_forge.views import ReadOnlyDict, ReadOnlyList, read_only
+
+
+def test_read_only_dict():
+    data = {"key": "value", "nested": {"items": [{"id": 1}, {"id": 2}]}}
+
+    view = read_only(data)
+
+    assert isinstance(view, ReadOnlyDict)
+    assert view == data
+    assert view["key"] == "value"
+    assert isinstance(view["nested"], ReadOnlyDict)
+    assert isinstance(view["nested"]["items"], ReadOnlyList)
+    assert view["nested"]["items"][1]["id"] == 2
+    assert list(view) == ["key", "nested"]
+    assert len(view) == 2
+
+    with pytest.raises(TypeError):
+        view["key"] = "other value"
+
+    with pytest.raises(TypeError):
+        view["nested"]["items"][0]["id"] = 3
+
+
+def test_read_only_list():
+    data = [{"id": 1}, {"id": 2}, {"id": 3}]
+
+    view = read_only(data)
+
+    assert isinstance(view, ReadOnlyList)
+    assert view == data
+    assert view[1:] == [{"id": 2}, {"id": 3}]
+    assert isinstance(view[0], ReadOnlyDict)
+    assert len(view) == 3
+
+    with pytest.raises(TypeError):
+        view[0] = {"id": 4}
+
+
+def test_read_only_reflects_source():
+    data = {"key": "value"}
+
+    view = read_only(data)
+    data["key"] = "other value"
+
+    assert view["key"] == "other value"
+
+
+def test_read_only_copy():
+    data = {"nested": {"key": "value"}}
+
+    copy = read_only(data).copy()
+    copy["nested"]["key"] = "other value"
+
+    assert data == {"nested": {"key": "value"}}
+
+
+def test_read_only_scalars():
+    assert read_only("value") == "value"
+    assert read_only(1) == 1
+    assert read_only(None) is None